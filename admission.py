@@ -0,0 +1,293 @@
+"""
+准入控制（ASGI 中间件）
+
+截止时间前各类请求同时争抢唯一的 SQLite 写连接和事件循环，
+注册接口发送邮件时，查询验证码剩余时间这样的轻量请求也要排队。
+这里把请求按路由分类，每类有独立的并发上限和有界的等待队列：
+
+- 并发上限根据延迟自动调整：延迟明显高于长期平均时降低上限，否则逐步提高；
+- 等待队列已满或等待超时时立即返回 503 和 Retry-After，不再继续堆积；
+- 所有类别共享一个总并发上限，空出位置时优先放行优先级高的类别（提交/分块上传 > 注册/查询 > 管理列表）。
+
+中间件只在一个事件循环中使用，不需要加锁。
+"""
+import heapq
+import itertools
+import json
+import math
+import time
+from asyncio import get_running_loop, wait_for, TimeoutError
+from typing import Dict, List, Optional
+
+# 所有类别合计的最大并发数
+GLOBAL_LIMIT = 64
+
+# 各类请求的配置
+#   priority: 优先级，越大越优先
+#   initial_limit / min_limit / max_limit: 并发上限的初始值和调整范围
+#   max_queue: 最多排队的请求数
+#   max_wait: 最长排队时间（秒）
+#   retry_after: 拒绝时建议客户端等待的秒数
+#   adaptive: 是否根据延迟调整并发上限（流式下载等耗时不代表负载的类别应关闭）
+ROUTE_CLASSES: Dict[str, dict] = {
+    "submission": dict(priority=3, initial_limit=8, min_limit=2, max_limit=32, max_queue=128, max_wait=10, retry_after=1),
+    # 分块上传的耗时取决于客户端带宽，不代表服务器负载，使用固定上限
+    "upload": dict(priority=3, initial_limit=8, min_limit=8, max_limit=8, max_queue=64, max_wait=10, retry_after=2, adaptive=False),
+    "register": dict(priority=2, initial_limit=4, min_limit=1, max_limit=16, max_queue=32, max_wait=5, retry_after=3),
+    "read": dict(priority=2, initial_limit=16, min_limit=4, max_limit=48, max_queue=128, max_wait=2, retry_after=1),
+    "admin": dict(priority=0, initial_limit=2, min_limit=1, max_limit=2, max_queue=4, max_wait=2, retry_after=10, adaptive=False),
+}
+
+# 不做准入控制的路径前缀（长连接、长轮询、过载时也需要可用的性能分析）
+EXEMPT_PREFIXES = ("/api/events/", "/api/changes", "/api/admin/profile/")
+
+# 管理列表接口
+ADMIN_PATHS = ("/get/registrations/all", "/api/submissions/all")
+
+# 与注册同类的写入接口（其余写入方法的请求也归入该类）
+WRITE_PATHS = ("/api/register", "/api/verify")
+
+
+def classify(method: str, path: str) -> Optional[str]:
+    """返回请求所属的类别，None 表示不做准入控制"""
+    if path.startswith(EXEMPT_PREFIXES):
+        return None
+    if path.startswith("/api/upload/") and method == "PUT":
+        return "upload"
+    if path == "/api/submission" or path.startswith("/api/upload"):
+        return "submission" if method == "POST" else "read"
+    if path in ADMIN_PATHS or path.startswith("/api/admin/"):
+        return "admin"
+    if (path in WRITE_PATHS and method == "POST") or method in ("PUT", "DELETE", "PATCH"):
+        return "register"
+    return "read"
+
+
+class Rejected(Exception):
+    """请求被拒绝（队列已满或等待超时）"""
+
+    def __init__(self, retry_after: int):
+        super().__init__()
+        self.retry_after = retry_after
+
+
+class AdaptiveLimit:
+    """
+    根据延迟调整的并发上限
+
+    维护长期平均延迟（基线）和短期平均延迟。短期延迟超过基线的 tolerance 倍时按比例降低上限，
+    否则在上限被充分使用时增加约 sqrt(limit) 的余量。
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, tolerance: float = 2.0,
+                 smoothing: float = 0.2, long_window: int = 600, short_window: int = 10):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self._long_alpha = 2 / (long_window + 1)
+        self._short_alpha = 2 / (short_window + 1)
+        self.long_latency: Optional[float] = None
+        self.short_latency: Optional[float] = None
+
+    @property
+    def value(self) -> int:
+        return int(self.limit)
+
+    def update(self, latency: float, in_flight: int) -> None:
+        if self.long_latency is None:
+            self.long_latency = self.short_latency = latency
+            return
+        self.short_latency += self._short_alpha * (latency - self.short_latency)
+        self.long_latency += self._long_alpha * (latency - self.long_latency)
+
+        gradient = max(0.5, min(1.0, self.tolerance * self.long_latency / self.short_latency))
+        if gradient >= 1.0 and in_flight < self.limit / 2:
+            # 上限没有被用到一半，不需要继续提高
+            return
+        target = self.limit * gradient + (math.sqrt(self.limit) if gradient >= 1.0 else 0)
+        self.limit = (1 - self.smoothing) * self.limit + self.smoothing * target
+        self.limit = max(self.minimum, min(self.maximum, self.limit))
+
+        # 持续过载时让基线慢慢跟上，避免上限一直停在最小值
+        if gradient < 1.0:
+            self.long_latency += self._long_alpha * (self.short_latency - self.long_latency)
+
+
+class RouteClass:
+    """一类请求的并发状态"""
+
+    def __init__(self, name: str, priority: int, initial_limit: int, min_limit: int, max_limit: int,
+                 max_queue: int, max_wait: float, retry_after: int, adaptive: bool = True):
+        self.name = name
+        self.priority = priority
+        self.limit = AdaptiveLimit(initial_limit, min_limit, max_limit)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+        self.adaptive = adaptive
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def has_capacity(self) -> bool:
+        return self.in_flight < self.limit.value
+
+    def snapshot(self) -> dict:
+        return {
+            "priority": self.priority,
+            "limit": self.limit.value,
+            "inFlight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "latencyMs": round(self.limit.short_latency * 1000, 2) if self.limit.short_latency is not None else None,
+            "baselineMs": round(self.limit.long_latency * 1000, 2) if self.limit.long_latency is not None else None
+        }
+
+
+class AdmissionController:
+    """按类别限制并发，共享总上限，按优先级放行排队的请求"""
+
+    def __init__(self, route_classes: Dict[str, dict] = None, global_limit: int = GLOBAL_LIMIT):
+        self.global_limit = global_limit
+        self.classes = {
+            name: RouteClass(name, **config)
+            for name, config in (route_classes or ROUTE_CLASSES).items()
+        }
+        self.in_flight = 0
+        self._seq = itertools.count()
+        # (-priority, 序号, 类别, future)
+        self._waiters: List[tuple] = []
+
+    def _can_admit(self, route_class: RouteClass) -> bool:
+        return self.in_flight < self.global_limit and route_class.has_capacity()
+
+    def _admit(self, route_class: RouteClass) -> None:
+        self.in_flight += 1
+        route_class.in_flight += 1
+        route_class.admitted += 1
+
+    def _has_priority_waiters(self, route_class: RouteClass) -> bool:
+        """是否有同等或更高优先级、且现在就可以放行的请求在排队"""
+        for neg_priority, _, waiting_class, future in self._waiters:
+            if -neg_priority < route_class.priority:
+                continue
+            if not future.done() and waiting_class.has_capacity():
+                return True
+        return False
+
+    async def acquire(self, route_class: RouteClass) -> None:
+        """
+        获取执行许可
+
+        Raises:
+            Rejected: 队列已满或等待超时
+        """
+        if self._can_admit(route_class) and not self._has_priority_waiters(route_class):
+            self._admit(route_class)
+            return
+
+        if route_class.waiting >= route_class.max_queue:
+            route_class.rejected += 1
+            raise Rejected(route_class.retry_after)
+
+        future = get_running_loop().create_future()
+        heapq.heappush(self._waiters, (-route_class.priority, next(self._seq), route_class, future))
+        route_class.waiting += 1
+        try:
+            await wait_for(future, timeout=route_class.max_wait)
+        except TimeoutError:
+            route_class.rejected += 1
+            raise Rejected(route_class.retry_after)
+        except BaseException:
+            # 客户端断开时许可可能已经发放，需要归还
+            if future.done() and not future.cancelled():
+                self.release(route_class, None)
+            raise
+        finally:
+            route_class.waiting -= 1
+
+    def release(self, route_class: RouteClass, latency: Optional[float]) -> None:
+        """释放许可并放行排队的请求"""
+        self.in_flight -= 1
+        route_class.in_flight -= 1
+        if latency is not None and route_class.adaptive:
+            route_class.limit.update(latency, route_class.in_flight + 1)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """按优先级放行排队的请求"""
+        skipped = []
+        while self._waiters and self.in_flight < self.global_limit:
+            item = heapq.heappop(self._waiters)
+            route_class, future = item[2], item[3]
+            if future.done():
+                continue  # 已超时或已取消
+            if not route_class.has_capacity():
+                skipped.append(item)
+                continue
+            self._admit(route_class)
+            future.set_result(True)
+        for item in skipped:
+            heapq.heappush(self._waiters, item)
+
+    def snapshot(self) -> dict:
+        return {
+            "globalLimit": self.global_limit,
+            "inFlight": self.in_flight,
+            "classes": {name: route_class.snapshot() for name, route_class in self.classes.items()}
+        }
+
+
+class AdmissionControlMiddleware:
+    """对 HTTP 请求做准入控制，被拒绝时返回 503 和 Retry-After"""
+
+    def __init__(self, app, controller: Optional[AdmissionController] = None):
+        self.app = app
+        self.controller = controller or admission_controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        name = classify(scope["method"], scope["path"])
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        route_class = self.controller.classes[name]
+        try:
+            await self.controller.acquire(route_class)
+        except Rejected as e:
+            await send_busy(send, e.retry_after)
+            return
+
+        start = time.perf_counter()
+        latency = None
+        try:
+            await self.app(scope, receive, send)
+            latency = time.perf_counter() - start
+        finally:
+            self.controller.release(route_class, latency)
+
+
+async def send_busy(send, retry_after: int) -> None:
+    body = json.dumps({"detail": "Server is busy, please retry later"}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(retry_after).encode())
+        ]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+# 全局准入控制器
+admission_controller = AdmissionController()
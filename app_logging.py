@@ -0,0 +1,218 @@
+"""
+结构化日志
+
+所有日志以 JSON 行的形式输出。请求线程中只把日志记录放入队列，
+格式化和写入由 QueueListener 的后台线程完成，不阻塞事件循环。
+
+RequestContextMiddleware 为每个请求分配 ID（或沿用请求头 X-Request-ID），
+保存在 contextvar 中，同一请求内数据库、邮件等模块的日志都会带上 request_id，
+响应头也会返回 X-Request-ID。
+
+访问日志等高频日志按 LOG_SAMPLE_RATES 采样，WARNING 及以上级别不采样；
+采样按请求ID决定，同一请求的日志要么全部保留，要么全部丢弃。
+"""
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+import zlib
+from datetime import datetime
+from typing import Dict, Optional
+
+# 日志级别
+LOG_LEVEL = logging.INFO
+
+# 队列容量，后台线程跟不上时丢弃新日志而不是阻塞请求
+LOG_QUEUE_SIZE = 10000
+
+# 高频日志的采样率（按 logger 名称），未列出的不采样
+LOG_SAMPLE_RATES: Dict[str, float] = {
+    "access": 0.1,
+    "database": 0.05,
+}
+
+# 当前请求ID
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+# 客户端传入的请求ID只接受简单字符，避免日志注入
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+# LogRecord 自带的属性，其余属性（通过 extra 传入）作为结构化字段输出
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["ContextQueueHandler"] = None
+
+
+class JSONFormatter(logging.Formatter):
+    """把日志记录格式化为一行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.utcfromtimestamp(record.created).isoformat(timespec="milliseconds") + "Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """按 logger 名称对 WARNING 以下的日志采样"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def _rate(self, name: str) -> Optional[float]:
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        if rate is None or rate >= 1:
+            return True
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            return zlib.crc32(request_id.encode()) % 10000 < rate * 10000
+        return random.random() < rate
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """
+    在调用线程中只记录请求ID，格式化留给后台线程
+
+    标准 QueueHandler.prepare 会在调用线程中格式化消息，这里跳过这一步。
+    队列已满时丢弃日志并计数。
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        # 采样过滤依赖请求ID，需要在过滤之前设置
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id_var.get()
+        return super().handle(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(level: int = LOG_LEVEL, stream=None, sample_rates: Optional[Dict[str, float]] = None) -> None:
+    """
+    配置根 logger：日志经队列交给后台线程以 JSON 格式写出（重复调用无副作用）
+
+    Args:
+        level: 日志级别
+        stream: 输出流，默认 stderr
+        sample_rates: 高频日志采样率，默认 LOG_SAMPLE_RATES
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JSONFormatter())
+
+    _queue_handler = ContextQueueHandler(log_queue)
+    _queue_handler.addFilter(SamplingFilter(LOG_SAMPLE_RATES if sample_rates is None else sample_rates))
+
+    root = logging.getLogger()
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """写出队列中剩余的日志并停止后台线程"""
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    _listener.stop()
+    logging.getLogger().removeHandler(_queue_handler)
+    _listener = None
+    _queue_handler = None
+
+
+def dropped_count() -> int:
+    """因队列已满被丢弃的日志条数"""
+    return _queue_handler.dropped if _queue_handler else 0
+
+
+access_logger = logging.getLogger("access")
+
+
+class RequestContextMiddleware:
+    """为每个请求设置请求ID并记录访问日志"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", ()):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        if not request_id or not _REQUEST_ID_PATTERN.match(request_id):
+            request_id = uuid.uuid4().hex[:16]
+
+        token = request_id_var.set(request_id)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_request_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            access_logger.log(
+                logging.WARNING if status_code >= 500 else logging.INFO,
+                "%s %s %s", scope["method"], scope["path"], status_code,
+                extra={
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status_code,
+                    "duration_ms": round((time.perf_counter() - start) * 1000, 2)
+                }
+            )
+            request_id_var.reset(token)
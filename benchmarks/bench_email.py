@@ -0,0 +1,139 @@
+"""
+邮件发送吞吐量基准测试
+
+启动本地 SMTP 测试服务器（smtp_sink.py），把 email_service 指向它，
+在不同并发数下调用 send_verification_email / send_confirmation_email，
+统计每秒发送的邮件数和各阶段（connect、tls、auth、data）的耗时。
+
+用法:
+    python benchmarks/bench_email.py --messages 200 --concurrency 1 4 16 --mode starttls
+    python benchmarks/bench_email.py --mode ssl --latency data=0.02 --fail data=0.05
+"""
+import argparse
+import os
+import smtplib
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import email_service  # noqa: E402
+from smtp_sink import SMTPSink, parse_stage_values  # noqa: E402
+
+
+class StageTimer:
+    """给 smtplib 的各个阶段计时"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._originals = {}
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def _wrap(self, cls, name, stage):
+        original = getattr(cls, name)
+        self._originals[(cls, name)] = original
+        timer = self
+
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                if stage == "tls" and cls is smtplib.SMTP_SSL:
+                    # SMTPS 的 _get_socket 包含 TCP 连接，扣除后即为 TLS 握手耗时
+                    elapsed -= getattr(timer._local, "connect", 0)
+                if stage == "connect":
+                    timer._local.connect = elapsed
+                timer.record(stage, elapsed)
+
+        setattr(cls, name, wrapper)
+
+    def install(self):
+        self._wrap(smtplib.SMTP, "_get_socket", "connect")
+        self._wrap(smtplib.SMTP_SSL, "_get_socket", "tls")
+        self._wrap(smtplib.SMTP, "starttls", "tls")
+        self._wrap(smtplib.SMTP, "login", "auth")
+        self._wrap(smtplib.SMTP, "sendmail", "data")
+
+    def uninstall(self):
+        for (cls, name), original in self._originals.items():
+            setattr(cls, name, original)
+        self._originals.clear()
+
+    def reset(self):
+        self.samples.clear()
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="邮件发送吞吐量基准测试")
+    parser.add_argument("--messages", type=int, default=200, help="每轮发送的邮件数")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="要测试的并发数")
+    parser.add_argument("--mode", choices=["ssl", "starttls"], default="starttls", help="连接方式")
+    parser.add_argument("--kind", choices=["verification", "confirmation"], default="verification", help="邮件类型")
+    parser.add_argument("--latency", action="append", metavar="STAGE=SECONDS", help="为测试服务器注入延迟")
+    parser.add_argument("--fail", action="append", metavar="STAGE=RATE", help="为测试服务器注入失败")
+    args = parser.parse_args()
+
+    use_ssl = args.mode == "ssl"
+    sink = SMTPSink(
+        use_ssl=use_ssl, starttls=not use_ssl,
+        latency=parse_stage_values(args.latency), failure_rate=parse_stage_values(args.fail)
+    ).start_in_thread()
+
+    # 把 email_service 指向本地测试服务器
+    email_service.SMTP_HOST = sink.host
+    email_service.SMTP_PORT = sink.port
+    email_service.USE_SSL = use_ssl
+    email_service.EMAIL_PASSWORD = email_service.EMAIL_PASSWORD or "benchmark"
+    email_service.logger.disabled = True
+
+    members = [{"name": f"Member {i}", "isLeader": i == 0} for i in range(4)]
+
+    def send(i):
+        if args.kind == "verification":
+            return email_service.send_verification_email(f"team{i}@example.com", "123456", "http://127.0.0.1:8000")
+        return email_service.send_confirmation_email(f"team{i}@example.com", f"Team {i}", f"team{i}", "Bench University", members)
+
+    timer = StageTimer()
+    timer.install()
+    try:
+        print(f"mode={args.mode} kind={args.kind} messages={args.messages}")
+        for concurrency in args.concurrency:
+            timer.reset()
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                results = list(pool.map(send, range(args.messages)))
+            elapsed = time.perf_counter() - start
+
+            stages = "  ".join(
+                f"{stage} p50={percentile(timer.samples[stage], 0.5) * 1000:.1f}ms "
+                f"p95={percentile(timer.samples[stage], 0.95) * 1000:.1f}ms"
+                for stage in ("connect", "tls", "auth", "data") if timer.samples[stage]
+            )
+            print(f"concurrency={concurrency:<3d} {results.count(True) / elapsed:7.1f} msg/s  "
+                  f"ok={results.count(True)} failed={results.count(False)}  elapsed={elapsed:.2f}s")
+            print(f"    {stages}")
+    finally:
+        timer.uninstall()
+        sink.stop_thread()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+注册接口吞吐量基准测试
+
+在临时目录中创建独立的数据库，并发调用 /api/register（其中一部分请求故意使用重复的用户名/邮箱以触发唯一约束），
+统计每秒注册数。邮件发送和邮箱域名检查被替换为空操作，只测量数据库写入路径。
+
+用法:
+    python benchmarks/bench_registration.py --requests 2000 --concurrency 32 --duplicate-ratio 0.2
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="注册接口吞吐量基准测试")
+    parser.add_argument("--requests", type=int, default=2000, help="注册请求总数")
+    parser.add_argument("--concurrency", type=int, default=32, help="并发客户端数")
+    parser.add_argument("--members", type=int, default=4, help="每个团队的成员数")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.2, help="重复用户名/邮箱请求所占比例")
+    args = parser.parse_args()
+
+    # 数据库路径是相对当前目录的，切换到临时目录避免污染正式数据库
+    os.chdir(tempfile.mkdtemp(prefix="bench_registration_"))
+
+    from fastapi.testclient import TestClient
+    import main as server
+
+    unique = int(args.requests * (1 - args.duplicate_ratio))
+
+    def payload(i):
+        n = i if i < unique else i % max(unique, 1)
+        return {
+            "teamName": f"Team {n}",
+            "organization": "Bench University",
+            "email": f"team{n}@example.com",
+            "username": f"team{n}",
+            "password": "secret",
+            "members": [{"name": f"Member {k}", "isLeader": k == 0} for k in range(args.members)],
+        }
+
+    from email_check import DomainStatus
+
+    with mock.patch.object(server, "send_verification_email", return_value=True), \
+            mock.patch.object(server.deliverability_checker, "check_email",
+                              mock.AsyncMock(return_value=DomainStatus(True, "mx"))), \
+            TestClient(server.app) as client:
+        def register(i):
+            return client.post("/api/register", json=payload(i)).status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            codes = list(pool.map(register, range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+    created = codes.count(200)
+    rejected = codes.count(400)
+    print(f"requests={args.requests} concurrency={args.concurrency} members={args.members}")
+    print(f"created={created} rejected={rejected} other={len(codes) - created - rejected}")
+    print(f"elapsed={elapsed:.2f}s  {len(codes) / elapsed:.1f} req/s  {created / elapsed:.1f} registrations/s")
+
+
+if __name__ == "__main__":
+    main()
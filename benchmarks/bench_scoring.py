@@ -0,0 +1,87 @@
+"""
+评分引擎吞吐量基准测试
+
+生成合成的金标准和预测文件，分别用不同数量的工作进程评分，统计每秒完成的评分任务数。
+
+用法:
+    python benchmarks/bench_scoring.py --cases 200 --size 256 --jobs 16 --workers 1 2 4 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from scoring import score_file  # noqa: E402
+
+
+def synthetic_masks(rng, cases, size):
+    """生成带有血管（矩形）和斑块（圆形）的标签图"""
+    masks = np.zeros((cases, size, size), dtype=np.uint8)
+    yy, xx = np.mgrid[:size, :size]
+    for i in range(cases):
+        top = rng.integers(size // 8, size // 2)
+        masks[i, top:top + size // 4, size // 8:size - size // 8] = 1
+        cy, cx = top + size // 8, rng.integers(size // 4, 3 * size // 4)
+        masks[i][(yy - cy) ** 2 + (xx - cx) ** 2 < (size // 12) ** 2] = 2
+    return masks
+
+
+def perturb(rng, masks):
+    """随机翻转少量像素，模拟预测误差"""
+    noisy = masks.copy()
+    flip = rng.random(masks.shape) < 0.01
+    noisy[flip] = rng.integers(0, 3, size=int(flip.sum()))
+    return noisy
+
+
+def main():
+    parser = argparse.ArgumentParser(description="评分引擎吞吐量基准测试")
+    parser.add_argument("--cases", type=int, default=200, help="每份预测的病例数")
+    parser.add_argument("--size", type=int, default=256, help="图像边长")
+    parser.add_argument("--jobs", type=int, default=16, help="评分任务数")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="要测试的工作进程数")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    workdir = tempfile.mkdtemp(prefix="bench_scoring_")
+    gt_dir = os.path.join(workdir, "ground_truth")
+    os.makedirs(gt_dir)
+
+    gt = {
+        "cls": rng.integers(0, 3, size=args.cases),
+        "long_mask": synthetic_masks(rng, args.cases, args.size),
+        "trans_mask": synthetic_masks(rng, args.cases, args.size),
+    }
+    for name, array in gt.items():
+        np.save(os.path.join(gt_dir, f"{name}.npy"), array)
+
+    prediction_path = os.path.join(workdir, "prediction.npz")
+    cls = gt["cls"].copy()
+    cls[rng.random(args.cases) < 0.2] = rng.integers(0, 3)
+    np.savez(prediction_path, cls=cls,
+             long_mask=perturb(rng, gt["long_mask"]), trans_mask=perturb(rng, gt["trans_mask"]))
+
+    print(f"cases={args.cases} size={args.size}x{args.size} jobs={args.jobs}")
+    baseline = None
+    for workers in args.workers:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # 预热进程池
+            list(pool.map(abs, range(workers)))
+            start = time.perf_counter()
+            results = list(pool.map(score_file, [None] * args.jobs, [prediction_path] * args.jobs, [gt_dir] * args.jobs))
+            elapsed = time.perf_counter() - start
+        throughput = args.jobs / elapsed
+        baseline = baseline or throughput
+        print(f"workers={workers:<3d} {throughput:6.2f} jobs/s  speedup={throughput / baseline:4.2f}x  "
+              f"score={results[0]['score']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
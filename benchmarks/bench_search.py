@@ -0,0 +1,149 @@
+"""
+全文搜索基准测试
+
+在临时目录中创建独立的数据库，生成大量合成团队（含成员和提交记录），测量：
+- 根据现有数据重建（回填）FTS5 索引的耗时；
+- 触发器对注册写入的额外开销；
+- 搜索延迟，与不使用索引的 LIKE 全表扫描对比。
+
+用法:
+    python benchmarks/bench_search.py --teams 100000 --members 3 --queries 200
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SYLLABLES = ["zhang", "wang", "li", "zhao", "chen", "liu", "yang", "huang", "zhou", "wu",
+             "xu", "sun", "ma", "zhu", "hu", "guo", "he", "lin", "luo", "gao"]
+WORDS = ["deep", "vision", "medical", "imaging", "cardiac", "neural", "lab", "team", "segmentation",
+         "learning", "brain", "signal", "robust", "fusion", "graph", "quantum", "pixel", "atlas"]
+ORGANIZATIONS = ["Tsinghua University", "Peking University", "Fudan University", "Zhejiang University",
+                 "Shanghai Jiao Tong University", "Nanjing University", "Imperial College London",
+                 "Stanford University", "ETH Zurich", "University of Tokyo"]
+QUERIES = ["zhang", "cardiac seg", "tsinghua", "vision lab", "wangli", "fud", "neural atlas", "huang wei"]
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def person(rng):
+    return f"{rng.choice(SYLLABLES).title()} {rng.choice(SYLLABLES)}{rng.choice(SYLLABLES)}"
+
+
+def generate(rng, start, count, members):
+    """生成 count 个团队的 (团队行, 成员行, 提交行)"""
+    teams, member_rows, submissions = [], [], []
+    for i in range(start, start + count):
+        username = f"{rng.choice(SYLLABLES)}{rng.choice(SYLLABLES)}{i}"
+        teams.append((i, f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {i}", rng.choice(ORGANIZATIONS),
+                      f"{username}@example.org", username))
+        member_rows.extend((i, person(rng), k == 0) for k in range(members))
+        if rng.random() < 0.3:
+            submissions.append((username, f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} v{rng.randint(1, 5)}"))
+    return teams, member_rows, submissions
+
+
+def insert_rows(conn, teams, member_rows, submissions):
+    cursor = conn.cursor()
+    cursor.executemany(
+        'INSERT INTO team_registrations (id, "teamName", organization, "orgAddress", email, username, password, is_verified, created_at) '
+        "VALUES (?, ?, ?, '', ?, ?, 'x', 1, datetime('now'))", teams)
+    cursor.executemany('INSERT INTO team_members (team_id, name, "isLeader") VALUES (?, ?, ?)', member_rows)
+    cursor.executemany("INSERT INTO submissions (username, title, url, description, created_at) "
+                       "VALUES (?, ?, 'http://example.org', '', datetime('now'))", submissions)
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="全文搜索基准测试")
+    parser.add_argument("--teams", type=int, default=100000, help="合成团队数")
+    parser.add_argument("--members", type=int, default=3, help="每个团队的成员数")
+    parser.add_argument("--incremental", type=int, default=2000, help="测量触发器开销时写入的团队数")
+    parser.add_argument("--queries", type=int, default=200, help="每种搜索方式执行的查询数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    # 数据库路径是相对当前目录的，切换到临时目录避免污染正式数据库
+    os.chdir(tempfile.mkdtemp(prefix="bench_search_"))
+
+    from sqlalchemy import text
+    from database import init_db, engine, SessionLocal
+    import search
+
+    # 回填和 LIKE 扫描都会超过慢查询阈值，不输出这些日志
+    logging.getLogger("database").setLevel(logging.ERROR)
+
+    rng = random.Random(args.seed)
+    init_db()
+    raw = engine.raw_connection()
+
+    # 回填：先写入基础数据（不带触发器），再一次性建立索引
+    start = time.perf_counter()
+    insert_rows(raw, *generate(rng, 1, args.teams, args.members))
+    print(f"teams={args.teams} members/team={args.members}  base insert: {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    indexed = search.rebuild_search_index()
+    print(f"backfill: {indexed} teams indexed in {time.perf_counter() - start:.2f}s")
+
+    # 触发器开销：分别在有/无触发器时写入相同数量的团队
+    next_id = args.teams + 1
+    for label, with_triggers in (("with triggers", True), ("without triggers", False)):
+        if not with_triggers:
+            search.disable_search_triggers()
+        rows = generate(rng, next_id, args.incremental, args.members)
+        next_id += args.incremental
+        start = time.perf_counter()
+        for i in range(args.incremental):
+            insert_rows(raw, [rows[0][i]], rows[1][i * args.members:(i + 1) * args.members], [])
+        elapsed = time.perf_counter() - start
+        print(f"insert {label:<17} {args.incremental / elapsed:8.1f} teams/s  ({elapsed * 1000 / args.incremental:.3f} ms/team)")
+    raw.close()
+    search.rebuild_search_index()
+
+    like_sql = text('''
+        SELECT count(DISTINCT t.id) FROM team_registrations t
+        LEFT JOIN team_members m ON m.team_id = t.id
+        LEFT JOIN submissions s ON s.username = t.username
+        WHERE t.username LIKE :p OR t."teamName" LIKE :p OR t.organization LIKE :p
+           OR t.email LIKE :p OR m.name LIKE :p OR s.title LIKE :p
+    ''')
+
+    db = SessionLocal()
+    try:
+        queries = [QUERIES[i % len(QUERIES)] for i in range(args.queries)]
+        fts_times, like_times = [], []
+        for q in queries:
+            start = time.perf_counter()
+            search.search_teams(db, q, limit=20)
+            fts_times.append(time.perf_counter() - start)
+        # LIKE 扫描只用每个查询的第一个词，比全文搜索做的事情更少
+        for q in queries[:max(1, args.queries // 10)]:
+            start = time.perf_counter()
+            db.execute(like_sql, {"p": f"%{q.split()[0]}%"}).scalar()
+            like_times.append(time.perf_counter() - start)
+
+        for q in QUERIES:
+            total, _ = search.search_teams(db, q, limit=20)
+            print(f"    {q!r:<16} {total} matches")
+        print(f"fts5 search  p50={percentile(fts_times, 0.5) * 1000:.2f}ms p95={percentile(fts_times, 0.95) * 1000:.2f}ms "
+              f"({len(fts_times)} queries)")
+        print(f"LIKE scan    p50={percentile(like_times, 0.5) * 1000:.2f}ms p95={percentile(like_times, 0.95) * 1000:.2f}ms "
+              f"({len(like_times)} queries)")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
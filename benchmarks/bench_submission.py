@@ -0,0 +1,81 @@
+"""
+提交接口组提交基准测试
+
+在临时目录中创建独立的数据库和一批已验证的团队，并发调用 /api/submission，
+分别在不攒批（每个请求单独 commit）和不同攒批参数下统计每秒提交数。
+每种配置使用新的数据库文件，提交标题各不相同，不会被重复提交检测拦截。
+
+用法:
+    python benchmarks/bench_submission.py --requests 2000 --concurrency 64 --delays 0 0.002 0.005 --batch-sizes 64
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="提交接口组提交基准测试")
+    parser.add_argument("--requests", type=int, default=2000, help="每种配置的提交请求总数")
+    parser.add_argument("--concurrency", type=int, default=64, help="并发客户端数")
+    parser.add_argument("--teams", type=int, default=200, help="已验证的团队数")
+    parser.add_argument("--delays", type=float, nargs="+", default=[0, 0.002, 0.005], help="攒批等待时间（秒），0 表示不攒批")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[64], help="每批最多的提交数")
+    args = parser.parse_args()
+
+    # 数据库路径是相对当前目录的，切换到临时目录避免污染正式数据库
+    os.chdir(tempfile.mkdtemp(prefix="bench_submission_"))
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import insert
+    import main as server
+    from database import engine, init_db, SessionLocal, TeamRegistration, Base
+    from submission_batch import SubmissionBatcher
+
+    def reset_database():
+        Base.metadata.drop_all(bind=engine)
+        init_db()
+        db = SessionLocal()
+        try:
+            db.execute(insert(TeamRegistration), [
+                {"teamName": f"Team {i}", "organization": "Bench University", "orgAddress": "",
+                 "email": f"team{i}@example.com", "username": f"team{i}", "password": "secret", "is_verified": True}
+                for i in range(args.teams)
+            ])
+            db.commit()
+        finally:
+            db.close()
+        server.registration_index.load()
+
+    configs = [(delay, size) for delay in args.delays for size in (args.batch_sizes if delay > 0 else [1])]
+    print(f"requests={args.requests} concurrency={args.concurrency} teams={args.teams}")
+    for delay, size in configs:
+        reset_database()
+        server.submission_batcher = batcher = SubmissionBatcher(max_batch_size=size, max_delay=delay)
+
+        with TestClient(server.app) as client:
+            def submit(i):
+                return client.post("/api/submission", json={
+                    "username": f"team{i % args.teams}",
+                    "title": f"Run {i} ({delay}/{size})",
+                    "url": f"https://example.org/{i}"
+                }).status_code
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                codes = list(pool.map(submit, range(args.requests)))
+            elapsed = time.perf_counter() - start
+
+        label = "no batching" if delay <= 0 else f"delay={delay * 1000:g}ms max={size}"
+        stats = batcher.stats()
+        print(f"{label:<24} {codes.count(200) / elapsed:8.1f} submissions/s  ok={codes.count(200)} "
+              f"batches={stats['batches']} avg batch={stats['averageBatch']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""
+批量导入团队
+
+用于预先导入受邀/合作团队。逐行流式解析 CSV 或 JSONL 文件，用注册接口的 RegistrationData 校验，
+每 IMPORT_BATCH_SIZE 个团队在一个事务中批量写入团队、成员、验证码和变更日志。
+导入在线程池中运行，使用独立的数据库连接（BackgroundSessionLocal），不与请求共用主连接。
+某一批与已有数据冲突（例如导入期间有人注册了同名用户）时，该批改为逐行写入，只跳过冲突的行。
+每个出错的行都会在报告中列出行号和原因，其余行照常导入。
+
+CSV 列: teamName, organization, orgAddress, email, username, password, members, leader
+    members 为以 ";" 分隔的成员姓名，leader 为队长姓名（可选，不在 members 中时自动加入）
+JSONL: 每行一个与 /api/register 请求体相同的 JSON 对象
+
+未加 --verified 时团队为未验证状态，并生成有效期 IMPORT_CODE_TTL 的验证码；
+加 --send-emails 时导入完成后复用SMTP连接批量发送验证码邮件。
+搜索索引由触发器维护，不需要额外处理。
+
+命令行用法:
+    python bulk_import.py teams.csv --dry-run          # 只校验，不写入
+    python bulk_import.py teams.csv --verified         # 直接标记为已验证，不发邮件
+    python bulk_import.py teams.jsonl --send-emails    # 未验证，发送验证码邮件
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import IO, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+
+from database import BackgroundSessionLocal, TeamRegistration, TeamMember, VerificationCode
+from email_service import generate_verification_code, send_verification_emails
+from schemas import RegistrationData
+from changes import record_change, team_state
+from user_index import registration_index
+from stats import stats_cache
+from config import SERVER_URL
+
+logger = logging.getLogger("bulk_import")
+
+# 支持的文件格式
+IMPORT_FORMATS = ("csv", "jsonl")
+
+# 每个事务写入的团队数
+IMPORT_BATCH_SIZE = 500
+
+# 报告中最多列出的错误行数
+IMPORT_MAX_ERRORS = 1000
+
+# 导入团队的验证码有效期（邀请邮件不一定会被及时查看，比注册时的10分钟长）
+IMPORT_CODE_TTL = timedelta(days=3)
+
+# 每个SMTP连接发送的邮件数（很多邮件服务商限制单个连接的发信数）
+EMAILS_PER_CONNECTION = 50
+
+
+class ImportReport:
+    """导入结果"""
+
+    def __init__(self, dry_run: bool = False):
+        self.dry_run = dry_run
+        self.total = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+
+    def add_error(self, line: int, username: Optional[str], message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "username": username, "error": message})
+
+    def to_dict(self) -> dict:
+        return {
+            "dryRun": self.dry_run,
+            "total": self.total,
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errorsTruncated": self.failed > len(self.errors)
+        }
+
+
+def parse_csv_row(row: dict) -> dict:
+    """CSV 行转换为 RegistrationData 的字段"""
+    record = {key: (value or "").strip() for key, value in row.items() if key}
+    names = [name.strip() for name in record.pop("members", "").split(";") if name.strip()]
+    leader = record.pop("leader", "")
+    if leader and leader not in names:
+        names.insert(0, leader)
+    record["members"] = [{"name": name, "isLeader": name == leader} for name in names]
+    return record
+
+
+def iter_records(stream: IO[str], format: str) -> Iterator[Tuple[int, object]]:
+    """
+    逐行读取文件
+
+    Yields:
+        (int, dict | Exception): 行号，记录或解析错误
+    """
+    if format == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, parse_csv_row(row)
+    else:
+        for line_no, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_no, ValueError(f"Invalid JSON: {e}")
+                continue
+            yield line_no, record if isinstance(record, dict) else ValueError("Each line must be a JSON object")
+
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(loc) for loc in e['loc'])}: {e['msg']}" for e in error.errors())
+
+
+def _insert_teams(db: Session, batch: List[Tuple[int, RegistrationData]], verified: bool) -> List[Tuple[str, str]]:
+    """在当前事务中写入一批团队，返回 (邮箱, 验证码) 列表"""
+    teams = [
+        TeamRegistration(
+            teamName=data.teamName,
+            organization=data.organization,
+            orgAddress=data.orgAddress,
+            email=data.email,
+            username=data.username,
+            password=data.password,
+            is_verified=verified
+        )
+        for _, data in batch
+    ]
+    db.add_all(teams)
+    db.flush()
+
+    member_rows = [
+        {"team_id": team.id, "name": member.name, "isLeader": member.isLeader}
+        for team, (_, data) in zip(teams, batch)
+        for member in data.members
+    ]
+    if member_rows:
+        db.execute(insert(TeamMember), member_rows)
+
+    codes = []
+    if not verified:
+        expires_at = datetime.utcnow() + IMPORT_CODE_TTL
+        codes = [(data.email, generate_verification_code(6)) for _, data in batch]
+        db.execute(insert(VerificationCode), [
+            {"email": email, "code": code, "expires_at": expires_at} for email, code in codes
+        ])
+
+    for team, (_, data) in zip(teams, batch):
+        record_change(db, "team", data.username, "imported", team_state(team, data.members))
+    return codes
+
+
+def _write_batch(db: Session, batch: List[Tuple[int, RegistrationData]], verified: bool,
+                 report: ImportReport) -> List[Tuple[str, str]]:
+    """写入一批团队，冲突时改为逐行写入并跳过冲突的行；只有提交成功的行计入导入数"""
+    conflicts = set()
+    try:
+        try:
+            codes = _insert_teams(db, batch, verified)
+            db.commit()
+            written = batch
+        except IntegrityError:
+            db.rollback()
+            codes, written = [], []
+            for item in batch:
+                try:
+                    with db.begin_nested():
+                        codes.extend(_insert_teams(db, [item], verified))
+                    written.append(item)
+                except IntegrityError as e:
+                    conflicts.add(item[0])
+                    report.add_error(item[0], item[1].username, f"Conflicts with an existing team: {e.orig}")
+            db.commit()
+    except OperationalError as e:
+        # 等待写锁超时等，整批都没有写入
+        db.rollback()
+        for line_no, data in batch:
+            if line_no not in conflicts:
+                report.add_error(line_no, data.username, f"Database error, team not imported: {e.orig}")
+        return []
+
+    report.imported += len(written)
+    registration_index.add_many([(data.username, data.email) for _, data in written], verified)
+    return codes
+
+
+def import_teams(stream: IO[str], format: str = "csv", verified: bool = False, dry_run: bool = False,
+                 batch_size: int = IMPORT_BATCH_SIZE) -> Tuple[ImportReport, List[Tuple[str, str]]]:
+    """
+    导入团队
+
+    Args:
+        stream: 文本流
+        format: csv 或 jsonl
+        verified: 是否直接标记为已验证
+        dry_run: 只校验，不写入
+        batch_size: 每个事务写入的团队数
+
+    Returns:
+        (ImportReport, list): 导入结果，需要发送的 (邮箱, 验证码) 列表
+    """
+    report = ImportReport(dry_run)
+    codes: List[Tuple[str, str]] = []
+    usernames, emails = set(), set()
+    batch: List[Tuple[int, RegistrationData]] = []
+
+    db = BackgroundSessionLocal()
+    try:
+        for line_no, record in iter_records(stream, format):
+            report.total += 1
+            if isinstance(record, Exception):
+                report.add_error(line_no, None, str(record))
+                continue
+            try:
+                data = RegistrationData.model_validate(record)
+            except ValidationError as e:
+                report.add_error(line_no, record.get("username"), validation_message(e))
+                continue
+
+            if data.username in usernames or registration_index.username_taken(data.username):
+                report.add_error(line_no, data.username, "Username already exists")
+                continue
+            if data.email in emails or registration_index.email_taken(data.email):
+                report.add_error(line_no, data.username, "Email already registered")
+                continue
+            usernames.add(data.username)
+            emails.add(data.email)
+
+            if dry_run:
+                continue
+            batch.append((line_no, data))
+            if len(batch) >= batch_size:
+                codes.extend(_write_batch(db, batch, verified, report))
+                batch = []
+
+        if batch:
+            codes.extend(_write_batch(db, batch, verified, report))
+    finally:
+        db.close()
+        if report.imported:
+            stats_cache.mark_dirty()
+
+    logger.info("批量导入完成", extra={"total": report.total, "imported": report.imported, "failed": report.failed})
+    return report, codes
+
+
+def import_file(file: IO[bytes], format: str = "csv", **kwargs) -> Tuple[ImportReport, List[Tuple[str, str]]]:
+    """从二进制文件导入（兼容 Excel 导出的带 BOM 的 UTF-8）"""
+    stream = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        return import_teams(stream, format, **kwargs)
+    finally:
+        stream.detach()
+
+
+def send_import_emails(codes: List[Tuple[str, str]], server_url: str = SERVER_URL) -> Tuple[int, int]:
+    """批量发送验证码邮件，返回 (成功数, 失败数)"""
+    sent = 0
+    for i in range(0, len(codes), EMAILS_PER_CONNECTION):
+        results = send_verification_emails(codes[i:i + EMAILS_PER_CONNECTION], server_url)
+        sent += sum(results.values())
+    failed = len(codes) - sent
+    logger.info("导入团队的验证码邮件已发送", extra={"sent": sent, "failed": failed})
+    return sent, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="从 CSV/JSONL 文件批量导入团队")
+    parser.add_argument("file", help="CSV 或 JSONL 文件")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="文件格式（默认根据扩展名判断）")
+    parser.add_argument("--verified", action="store_true", help="直接标记为已验证")
+    parser.add_argument("--send-emails", action="store_true", help="为未验证的团队发送验证码邮件")
+    parser.add_argument("--dry-run", action="store_true", help="只校验，不写入")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help="每个事务写入的团队数")
+    args = parser.parse_args()
+
+    format = args.format or ("jsonl" if os.path.splitext(args.file)[1].lower() in (".jsonl", ".ndjson") else "csv")
+    with open(args.file, "rb") as f:
+        report, codes = import_file(f, format, verified=args.verified, dry_run=args.dry_run, batch_size=args.batch_size)
+
+    print(f"共 {report.total} 行，导入 {report.imported} 个团队，失败 {report.failed} 行")
+    for error in report.errors:
+        print(f"  第 {error['line']} 行 ({error['username'] or '-'}): {error['error']}")
+
+    if args.send_emails and codes:
+        sent, failed = send_import_emails(codes)
+        print(f"验证码邮件发送成功 {sent} 封，失败 {failed} 封")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+import itertools
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows 下不加文件锁，多 worker 同时写入时可能少加一次
+    fcntl = None
+
+
+# 进程启动标识（ETag 和事件ID共用），防止服务重启后版本号重复导致旧ETag误命中
+BOOT_ID = uuid.uuid4().hex[:8]
+
+
+# TeamCache 跨进程失效用的版本号文件
+TEAM_CACHE_STAMP_PATH = "./.team_cache.stamp"
+
+
+class VersionStamp:
+    """
+    跨进程共享的版本号，保存在文件中
+
+    每次写入时加一（加文件锁），其他进程比较读到的版本号即可发现变化。
+    不使用文件修改时间：很多文件系统上 mtime 的精度只有一个时钟周期，
+    同一周期内两个 worker 的写入会被当成一次。
+    """
+
+    WIDTH = 20
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def read(self) -> int:
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read(self.WIDTH)
+        except FileNotFoundError:
+            return 0
+        try:
+            return int(data)
+        except ValueError:
+            return 0
+
+    def bump(self) -> Tuple[int, int]:
+        """版本号加一，返回 (加一前的版本号, 新版本号)"""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                previous = int(os.read(fd, self.WIDTH))
+            except ValueError:
+                previous = 0
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.write(fd, str(previous + 1).zfill(self.WIDTH).encode())
+            return previous, previous + 1
+        finally:
+            os.close(fd)  # 关闭时释放文件锁
+
+
+class TeamCache:
+    """
+    按用户名缓存团队数据（成员列表、提交历史）的进程内 LRU/TTL 缓存
+
+    每个团队维护一个版本号，数据发生变化时调用 invalidate() 递增版本号并清除缓存，
+    弱ETag 由版本号生成，客户端带 If-None-Match 重复请求时无需访问数据库即可返回 304。
+
+    多个 uvicorn worker 之间通过共享的版本号文件失效：任一进程 invalidate() 时把版本号加一，
+    其他进程在下次读取时发现版本号变化，清空本进程的全部缓存并重新分配版本号（ETag 随之改变）。
+    """
+
+    def __init__(self, maxsize: int = 2048, ttl: float = 300, stamp_path: Optional[str] = TEAM_CACHE_STAMP_PATH):
+        """
+        Args:
+            maxsize: 最多缓存的条目数
+            ttl: 缓存条目有效期（秒）
+            stamp_path: 跨进程失效用的版本号文件，None 表示只在本进程内失效
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # {(username, kind): (expires, value)}
+        self._versions = OrderedDict()  # {username: version}
+        self._counter = itertools.count(1)  # 全局递增，版本号被淘汰后重新分配也不会重复
+        self._lock = threading.Lock()
+        self._shared = VersionStamp(stamp_path) if stamp_path else None
+        self._seen = None  # 本进程缓存对应的共享版本号
+
+    def _sync(self) -> bool:
+        """共享版本号变化（其他进程写入）时清空本进程的缓存，返回是否发生了变化（需持有锁）"""
+        if self._shared is None:
+            return False
+        current = self._shared.read()
+        if current == self._seen:
+            return False
+        if self._seen is not None:
+            self._entries.clear()
+            self._versions.clear()
+        self._seen = current
+        return True
+
+    def _version(self, username: str) -> int:
+        version = self._versions.get(username)
+        if version is None:
+            version = next(self._counter)
+            self._versions[username] = version
+            if len(self._versions) > self.maxsize:
+                self._versions.popitem(last=False)
+        else:
+            self._versions.move_to_end(username)
+        return version
+
+    def etag(self, username: str, kind: str) -> str:
+        """返回某团队某类数据当前的弱ETag"""
+        with self._lock:
+            self._sync()
+            return f'W/"{kind}-{BOOT_ID}-{self._version(username)}"'
+
+    def get(self, username: str, kind: str) -> Optional[Any]:
+        """读取缓存，未命中或已过期返回 None"""
+        key = (username, kind)
+        with self._lock:
+            self._sync()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if time.monotonic() > expires:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, username: str, kind: str, value: Any) -> None:
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        key = (username, kind)
+        with self._lock:
+            # 读取数据库期间其他进程有写入时，value 可能已经过时，不缓存
+            if self._sync():
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, username: str, broadcast: bool = True) -> None:
+        """
+        团队数据变化时调用：清除该团队的缓存并递增版本号
+
+        Args:
+            broadcast: 是否通知其他进程（每个进程都会自行发现的变化，例如评分进度，不需要通知）
+        """
+        if broadcast and self._shared is not None:
+            previous, current = self._shared.bump()
+        with self._lock:
+            if broadcast and self._shared is not None:
+                # 期间没有其他进程写入时只需清除该团队，否则清空全部
+                if previous != self._seen:
+                    self._entries.clear()
+                    self._versions.clear()
+                self._seen = current
+            for key in [k for k in self._entries if k[0] == username]:
+                del self._entries[key]
+            self._versions[username] = next(self._counter)
+            self._versions.move_to_end(username)
+            if len(self._versions) > self.maxsize:
+                self._versions.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+
+# 全局缓存实例
+team_cache = TeamCache()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """判断请求头 If-None-Match 是否与当前ETag匹配（弱比较）"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return any((c[2:] if c.startswith("W/") else c) == bare for c in candidates)
+
+
+class TTLCache:
+    """通用的有界 LRU/TTL 缓存"""
+
+    def __init__(self, maxsize: int = 4096, ttl: float = 60):
+        """
+        Args:
+            maxsize: 最多缓存的条目数
+            ttl: 缓存条目有效期（秒）
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # {key: (expires, value)}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, key) -> Optional[Any]:
+        """读取缓存，未命中或已过期返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, value = entry
+            if time.monotonic() > expires:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value: Any, ttl: Optional[float] = None) -> None:
+        """写入缓存，超出容量时淘汰最久未使用的条目；ttl 为 None 时使用默认有效期"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# 短时间内相同 (username, url, title) 的重复提交直接返回上一次的结果
+SUBMISSION_DEDUP_WINDOW = 30  # 秒
+recent_submissions = TTLCache(maxsize=10000, ttl=SUBMISSION_DEDUP_WINDOW)
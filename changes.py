@@ -0,0 +1,167 @@
+"""
+变更日志
+
+register_team、verify_code、submit_work 等接口在写入业务数据的同一事务中追加一条变更记录，
+记录的 id 单调递增，作为游标。脚本通过 /api/changes?cursor= 只获取上次之后的变更，
+不再反复下载全部注册信息和提交记录做比对；带 wait 参数时没有新变更会挂起等待（长轮询）。
+
+每条记录保存变更后实体的完整状态，因此压缩时可以删除已被同一实体的更新记录取代的旧记录：
+持有旧游标的客户端会跳过中间状态，但仍能得到每个实体的最新状态，游标不会失效。
+
+命令行用法:
+    python changes.py --compact          # 压缩超过保留期的旧记录
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, ChangeLog, TeamRegistration, Submission
+
+# 每次最多返回的记录数
+CHANGES_MAX_LIMIT = 1000
+
+# 长轮询最长等待时间（秒）
+CHANGES_MAX_WAIT = 30
+
+# 长轮询时检查数据库的间隔（秒），用于发现其他 worker 写入的变更
+CHANGES_POLL_INTERVAL = 1.0
+
+# 超过该时间的记录在被同一实体的新记录取代后可以压缩
+CHANGES_RETENTION = timedelta(days=1)
+
+# 服务内自动压缩的间隔（秒）
+CHANGES_COMPACT_INTERVAL = 3600
+
+
+def team_state(team: TeamRegistration, members) -> dict:
+    """团队的完整状态（不含密码）"""
+    return {
+        "teamName": team.teamName,
+        "organization": team.organization,
+        "email": team.email,
+        "username": team.username,
+        "isVerified": bool(team.is_verified),
+        "members": [{"name": m.name, "isLeader": m.isLeader} for m in members]
+    }
+
+
+def submission_state(submission: Submission) -> dict:
+    return {
+        "id": submission.id,
+        "username": submission.username,
+        "title": submission.title,
+        "url": submission.url,
+        "description": submission.description,
+        "created_at": submission.created_at.isoformat() if submission.created_at else None
+    }
+
+
+def record_change(db: Session, entity: str, entity_key, action: str, data: dict) -> None:
+    """追加一条变更记录（不提交，由调用方与业务数据一起提交）"""
+    db.add(ChangeLog(
+        entity=entity,
+        entity_key=str(entity_key),
+        action=action,
+        data=json.dumps(data, ensure_ascii=False)
+    ))
+
+
+def fetch_changes(db: Session, cursor: int, limit: int) -> Tuple[List[dict], int, bool]:
+    """
+    读取游标之后的变更
+
+    Returns:
+        (list, int, bool): 变更列表，新的游标，是否还有更多
+    """
+    rows = db.query(ChangeLog).filter(ChangeLog.id > cursor).order_by(ChangeLog.id).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    items = [
+        {
+            "cursor": row.id,
+            "entity": row.entity,
+            "key": row.entity_key,
+            "action": row.action,
+            "data": json.loads(row.data),
+            "createdAt": row.created_at.isoformat()
+        }
+        for row in rows
+    ]
+    return items, rows[-1].id if rows else cursor, has_more
+
+
+class ChangeNotifier:
+    """本进程内有新变更时唤醒长轮询（只能在事件循环线程中调用）"""
+
+    def __init__(self):
+        self._event = asyncio.Event()
+
+    def notify(self) -> None:
+        self._event.set()
+        self._event = asyncio.Event()
+
+    async def wait_for_changes(self, cursor: int, limit: int, timeout: float) -> Tuple[List[dict], int, bool]:
+        """等待游标之后出现变更，超时返回空列表"""
+        deadline = time.monotonic() + timeout
+        while True:
+            event = self._event
+            db = SessionLocal()
+            try:
+                result = fetch_changes(db, cursor, limit)
+            finally:
+                db.close()
+            remaining = deadline - time.monotonic()
+            if result[0] or remaining <= 0:
+                return result
+            try:
+                await asyncio.wait_for(event.wait(), timeout=min(remaining, CHANGES_POLL_INTERVAL))
+            except asyncio.TimeoutError:
+                pass
+
+
+def compact_changes(db: Session, retention: timedelta = CHANGES_RETENTION) -> int:
+    """删除超过保留期、且已被同一实体更新的记录取代的旧记录，返回删除条数"""
+    cutoff = datetime.utcnow() - retention
+    result = db.execute(text('''
+        DELETE FROM change_log
+        WHERE created_at < :cutoff
+          AND EXISTS (
+              SELECT 1 FROM change_log AS newer
+              WHERE newer.entity = change_log.entity
+                AND newer.entity_key = change_log.entity_key
+                AND newer.id > change_log.id
+          )
+    '''), {"cutoff": cutoff})
+    db.commit()
+    return result.rowcount
+
+
+# 全局通知器
+change_notifier = ChangeNotifier()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="变更日志维护")
+    parser.add_argument("--compact", action="store_true", help="压缩超过保留期的旧记录")
+    parser.add_argument("--retention-hours", type=float, default=CHANGES_RETENTION.total_seconds() / 3600, help="保留期（小时）")
+    args = parser.parse_args()
+
+    if args.compact:
+        db = SessionLocal()
+        try:
+            removed = compact_changes(db, timedelta(hours=args.retention_hours))
+        finally:
+            db.close()
+        print(f"已压缩 {removed} 条变更记录")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
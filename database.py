@@ -1,8 +1,15 @@
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, ForeignKey, DateTime
+from sqlalchemy import create_engine, event, Column, Integer, String, Boolean, ForeignKey, DateTime, Float, Text, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from sqlalchemy.pool import StaticPool
 from datetime import datetime
+import logging
+import time
+
+logger = logging.getLogger("database")
+
+# 超过该耗时（毫秒）的SQL以 WARNING 级别记录，其余以 DEBUG 级别记录
+SLOW_QUERY_MS = 200
 
 # SQLite数据库文件路径
 SQLALCHEMY_DATABASE_URL = "sqlite:///./challenge_server.db"
@@ -17,6 +24,50 @@ engine = create_engine(
 # 创建会话
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 读取引擎：导出、统计等在线程池中运行的读取使用独立连接，不占用主连接（连接本身可写，只用于读取）
+read_engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False}
+)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# 后台写入引擎：批量导入等在线程池中运行的写入使用独立连接。
+# 不能与请求共用 StaticPool 的连接，否则任一会话关闭时的 rollback 会撤销其他会话尚未提交的写入
+BACKGROUND_BUSY_TIMEOUT = 30  # 与主连接争用写锁时最多等待的秒数（sqlite busy_timeout）
+background_engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False, "timeout": BACKGROUND_BUSY_TIMEOUT}
+)
+BackgroundSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=background_engine)
+
+# 记录SQL耗时（日志中带有当前请求ID）
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_start"] = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info.pop("query_start", time.perf_counter())) * 1000
+    level = logging.WARNING if elapsed_ms >= SLOW_QUERY_MS else logging.DEBUG
+    if logger.isEnabledFor(level):
+        logger.log(level, "slow query" if level == logging.WARNING else "query", extra={
+            "statement": statement[:500],
+            "duration_ms": round(elapsed_ms, 2),
+            "rows": cursor.rowcount
+        })
+
+# 使用 WAL 日志模式：读事务不阻塞写入。默认的回滚日志模式下，
+# 慢速下载的流式导出会一直持有共享锁，注册和提交的 commit 会等待直到超时
+def _set_journal_mode(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+    finally:
+        cursor.close()
+
+for _engine in (engine, read_engine, background_engine):
+    event.listen(_engine, "connect", _set_journal_mode)
+    event.listen(_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(_engine, "after_cursor_execute", _after_cursor_execute)
+
 # 创建基类
 Base = declarative_base()
 
@@ -41,7 +92,7 @@ class TeamMember(Base):
     __tablename__ = "team_members"
     
     id = Column(Integer, primary_key=True, index=True)
-    team_id = Column(Integer, ForeignKey("team_registrations.id"))
+    team_id = Column(Integer, ForeignKey("team_registrations.id"), index=True)
     name = Column(String, nullable=False)
     isLeader = Column(Boolean, default=False)
     
@@ -73,6 +124,74 @@ class Submission(Base):
     # 关联团队
     team = relationship("TeamRegistration", foreign_keys=[username], backref="submissions")
 
+# 提交接口的幂等键（与提交记录在同一事务中写入，多个 worker 共享）
+class SubmissionIdempotencyKey(Base):
+    __tablename__ = "submission_idempotency_keys"
+    __table_args__ = (
+        UniqueConstraint("username", "key"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    username = Column(String, nullable=False)
+    key = Column(String, nullable=False)  # 客户端传入的 Idempotency-Key
+    fingerprint = Column(String, nullable=False)  # 请求内容的哈希，同一个键用于不同内容时拒绝
+    submission_id = Column(Integer, ForeignKey("submissions.id"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+# 提交文件上传表（分块上传会话）
+class SubmissionUpload(Base):
+    __tablename__ = "submission_uploads"
+    
+    id = Column(String, primary_key=True)  # 上传会话ID
+    username = Column(String, ForeignKey("team_registrations.username"), nullable=False, index=True)
+    filename = Column(String, nullable=False)
+    total_size = Column(Integer, nullable=False)
+    received = Column(Integer, default=0)  # 已写入的字节数，断点续传的偏移量
+    sha256 = Column(String, index=True)  # 上传完成后的文件哈希
+    submission_id = Column(Integer, ForeignKey("submissions.id"), index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime)
+    
+    # 关联提交记录
+    submission = relationship("Submission", backref="uploads")
+
+# 评分任务表（持久化任务队列，评分结果也保存在这里）
+class ScoringJob(Base):
+    __tablename__ = "scoring_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    submission_id = Column(Integer, ForeignKey("submissions.id"), nullable=False, index=True)
+    status = Column(String, default="queued", index=True)  # queued / running / done / failed
+    attempts = Column(Integer, default=0)
+    progress = Column(Float, default=0.0)  # 0 ~ 1
+    error = Column(Text)
+    cls_score = Column(Float)  # 分类得分（各类别F1均值，0~100）
+    seg_score = Column(Float)  # 分割得分（DSC与NSD加权，0~100）
+    score = Column(Float)  # 0.4 * cls_score + 0.4 * seg_score（处理时间得分另行计算）
+    metrics = Column(Text)  # 详细指标（JSON）
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    
+    # 关联提交记录
+    submission = relationship("Submission", backref="scoring_jobs")
+
+# 变更日志（只追加，与业务数据在同一事务中写入，id 即游标）
+class ChangeLog(Base):
+    __tablename__ = "change_log"
+    __table_args__ = (
+        Index("ix_change_log_entity_key", "entity", "entity_key", "id"),
+        {"sqlite_autoincrement": True},  # 删除旧记录后 id 也不会被重用
+    )
+    
+    id = Column(Integer, primary_key=True)
+    entity = Column(String, nullable=False)  # team / submission
+    entity_key = Column(String, nullable=False)  # 团队用户名 / 提交ID
+    action = Column(String, nullable=False)  # registered / verified / submitted
+    data = Column(Text, nullable=False)  # 变更后的完整状态（JSON）
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
 # 创建所有表
 def init_db():
     Base.metadata.create_all(bind=engine)
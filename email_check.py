@@ -0,0 +1,143 @@
+"""
+邮箱域名可投递性预检查
+
+EmailStr 只检查格式，域名拼错（如 gmial.com）时仍会走完整的 SMTP 发送，退信后留下未验证的注册。
+注册前先查询域名的 MX 记录（没有 MX 时按 RFC 5321 回退到 A/AAAA 记录）：
+
+- 域名不存在、声明不收邮件（RFC 7505 null MX）或没有任何地址时判定为不可投递；
+- DNS 超时或服务器故障时无法判断，放行（不阻止注册）；
+- 结果缓存在 LRU/TTL 缓存中，不可投递的结果也会缓存（有效期较短），同一域名的并发查询只发一次；
+- 同时进行的 DNS 查询数量有上限。
+
+resolver 参数可以传入任何提供 `async resolve(name, rdtype)` 方法的对象（与 dns.asyncresolver.Resolver 相同），
+便于在没有网络的环境中测试。
+"""
+import asyncio
+from typing import Dict, NamedTuple, Optional
+
+import dns.asyncresolver
+import dns.exception
+import dns.resolver
+
+from cache import TTLCache
+
+# 单次查询的超时时间（秒）
+DNS_TIMEOUT = 3.0
+
+# 同时进行的 DNS 查询数量上限
+DNS_CONCURRENCY = 16
+
+# 缓存条目数
+DOMAIN_CACHE_SIZE = 4096
+
+# 可投递结果的缓存时间（秒）
+POSITIVE_TTL = 6 * 3600
+
+# 不可投递结果的缓存时间（秒），域名配置修复后较快生效
+NEGATIVE_TTL = 600
+
+# 无法判断（超时等）的结果只短暂缓存，避免 DNS 故障时反复等待超时
+UNKNOWN_TTL = 30
+
+
+class DomainStatus(NamedTuple):
+    """
+    deliverable: True 可投递，False 不可投递，None 无法判断
+    reason: mx / a / nxdomain / null-mx / no-address / error
+    """
+    deliverable: Optional[bool]
+    reason: str
+
+
+class DeliverabilityChecker:
+    """查询邮箱域名是否可以接收邮件"""
+
+    def __init__(self, resolver=None, concurrency: int = DNS_CONCURRENCY, timeout: float = DNS_TIMEOUT,
+                 cache: Optional[TTLCache] = None):
+        self._resolver = resolver
+        self.timeout = timeout
+        self.cache = cache or TTLCache(maxsize=DOMAIN_CACHE_SIZE, ttl=POSITIVE_TTL)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    @property
+    def resolver(self):
+        if self._resolver is None:
+            self._resolver = dns.asyncresolver.Resolver()
+            self._resolver.lifetime = self.timeout
+        return self._resolver
+
+    async def _resolve(self, domain: str, rdtype: str):
+        """查询一条记录，NoAnswer 时返回 None，NXDOMAIN 向上抛出"""
+        try:
+            return await self.resolver.resolve(domain, rdtype)
+        except dns.resolver.NoAnswer:
+            return None
+
+    async def _lookup(self, domain: str) -> DomainStatus:
+        async with self._semaphore:
+            try:
+                answer = await self._resolve(domain, "MX")
+                if answer is not None:
+                    hosts = [str(record.exchange) for record in answer]
+                    if hosts == ["."]:
+                        return DomainStatus(False, "null-mx")
+                    return DomainStatus(True, "mx")
+
+                # 没有 MX 记录时邮件投递到域名本身的地址
+                for rdtype in ("A", "AAAA"):
+                    if await self._resolve(domain, rdtype) is not None:
+                        return DomainStatus(True, "a")
+                return DomainStatus(False, "no-address")
+            except dns.resolver.NXDOMAIN:
+                return DomainStatus(False, "nxdomain")
+            except (dns.exception.DNSException, OSError):
+                return DomainStatus(None, "error")
+
+    async def check_domain(self, domain: str) -> DomainStatus:
+        domain = domain.strip().rstrip(".").lower()
+        status = self.cache.get(domain)
+        if status is not None:
+            return status
+
+        # 同一域名正在查询时等待同一个结果
+        pending = self._pending.get(domain)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[domain] = future
+        try:
+            status = await self._lookup(domain)
+            if status.deliverable is None:
+                ttl = UNKNOWN_TTL
+            else:
+                ttl = POSITIVE_TTL if status.deliverable else NEGATIVE_TTL
+            self.cache.set(domain, status, ttl=ttl)
+            future.set_result(status)
+            return status
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其他等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        finally:
+            del self._pending[domain]
+
+    async def check_email(self, email: str) -> DomainStatus:
+        return await self.check_domain(email.rpartition("@")[2])
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.cache.hits,
+            "misses": self.cache.misses,
+            "hitRate": round(self.cache.hit_rate, 4),
+            "pending": len(self._pending)
+        }
+
+
+# 全局检查器
+deliverability_checker = DeliverabilityChecker()
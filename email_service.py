@@ -2,10 +2,11 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.header import Header
-from typing import List, Dict
+from typing import List, Dict, Tuple
 import logging
 import random
 import string
+import time
 
 # 导入配置
 from config import (
@@ -15,11 +16,14 @@ from config import (
     SYSTEM_NAME, CONTACT_EMAIL
 )
 
-# 配置日志
-logging.basicConfig(level=logging.INFO)
+# 日志输出由 app_logging.setup_logging() 统一配置
 logger = logging.getLogger(__name__)
 
 
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
 def generate_verification_code(length=6) -> str:
     """
     生成随机验证码
@@ -51,48 +55,106 @@ def send_verification_email(recipient_email: str, verification_code: str, server
         logger.error("邮箱授权码未配置，请在 config.py 中设置 EMAIL_PASSWORD")
         return False
     
+    start = time.perf_counter()
     try:
-        # 构建邮件内容
-        html_content = build_verification_email_template(verification_code, recipient_email, server_url)
-        
-        # 创建邮件对象
-        message = MIMEMultipart('alternative')
-        message['From'] = EMAIL_SENDER
-        message['To'] = recipient_email
-        message['Subject'] = Header("Registration Verification Code - Please Verify Your Email", 'utf-8')
-        
-        # 添加HTML内容
-        html_part = MIMEText(html_content, 'html', 'utf-8')
-        message.attach(html_part)
-        
-        # 连接SMTP服务器并发送
-        if USE_SSL:
-            server = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT)
-        else:
-            server = smtplib.SMTP(SMTP_HOST, SMTP_PORT)
-            server.starttls()
-        
-        # 登录
-        server.login(EMAIL_SENDER, EMAIL_PASSWORD)
+        message = build_verification_message(recipient_email, verification_code, server_url)
+        server = connect_smtp()
         
         # 发送邮件
         server.sendmail(EMAIL_SENDER, recipient_email, message.as_string())
         server.quit()
         
-        logger.info(f"验证码邮件已发送至: {recipient_email}")
+        logger.info("验证码邮件已发送", extra={"recipient": recipient_email, "duration_ms": _elapsed_ms(start)})
         return True
         
     except smtplib.SMTPAuthenticationError:
-        logger.error("邮箱认证失败，请检查邮箱地址和授权码是否正确")
+        logger.error("邮箱认证失败，请检查邮箱地址和授权码是否正确", extra={"recipient": recipient_email, "duration_ms": _elapsed_ms(start)})
         return False
     except smtplib.SMTPException as e:
-        logger.error(f"SMTP错误: {str(e)}")
+        logger.error(f"SMTP错误: {str(e)}", extra={"recipient": recipient_email, "duration_ms": _elapsed_ms(start)})
         return False
     except Exception as e:
-        logger.error(f"发送邮件失败: {str(e)}")
+        logger.error(f"发送邮件失败: {str(e)}", extra={"recipient": recipient_email, "duration_ms": _elapsed_ms(start)})
         return False
 
 
+def build_verification_message(recipient_email: str, verification_code: str, server_url: str = None) -> MIMEMultipart:
+    """构建验证码邮件对象"""
+    html_content = build_verification_email_template(verification_code, recipient_email, server_url)
+    
+    message = MIMEMultipart('alternative')
+    message['From'] = EMAIL_SENDER
+    message['To'] = recipient_email
+    message['Subject'] = Header("Registration Verification Code - Please Verify Your Email", 'utf-8')
+    message.attach(MIMEText(html_content, 'html', 'utf-8'))
+    return message
+
+
+def connect_smtp() -> smtplib.SMTP:
+    """连接并登录SMTP服务器"""
+    if USE_SSL:
+        server = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT)
+    else:
+        server = smtplib.SMTP(SMTP_HOST, SMTP_PORT)
+        server.starttls()
+    server.login(EMAIL_SENDER, EMAIL_PASSWORD)
+    return server
+
+
+def send_verification_emails(items: List[Tuple[str, str]], server_url: str = None) -> Dict[str, bool]:
+    """
+    批量发送验证码邮件，复用同一个SMTP连接（连接断开时重连一次）
+    
+    Args:
+        items: (收件人邮箱, 验证码) 列表
+        server_url: 服务器地址(可选)
+        
+    Returns:
+        dict: 收件人邮箱 -> 是否发送成功
+    """
+    results = {email: False for email, _ in items}
+    if not EMAIL_PASSWORD:
+        logger.error("邮箱授权码未配置，请在 config.py 中设置 EMAIL_PASSWORD")
+        return results
+    
+    server = None
+    try:
+        for recipient_email, verification_code in items:
+            start = time.perf_counter()
+            message = build_verification_message(recipient_email, verification_code, server_url).as_string()
+            for attempt in range(2):
+                try:
+                    if server is None:
+                        server = connect_smtp()
+                    server.sendmail(EMAIL_SENDER, recipient_email, message)
+                    results[recipient_email] = True
+                    logger.info("验证码邮件已发送", extra={"recipient": recipient_email, "duration_ms": _elapsed_ms(start)})
+                    break
+                except smtplib.SMTPAuthenticationError:
+                    logger.error("邮箱认证失败，请检查邮箱地址和授权码是否正确", extra={"recipient": recipient_email, "duration_ms": _elapsed_ms(start)})
+                    return results
+                except smtplib.SMTPServerDisconnected as e:
+                    # 连接失效，重连后再试一次
+                    server = None
+                    if attempt:
+                        logger.error(f"SMTP错误: {str(e)}", extra={"recipient": recipient_email, "duration_ms": _elapsed_ms(start)})
+                except smtplib.SMTPException as e:
+                    # 单个收件人被拒绝，连接仍可继续使用
+                    logger.error(f"SMTP错误: {str(e)}", extra={"recipient": recipient_email, "duration_ms": _elapsed_ms(start)})
+                    break
+                except OSError as e:
+                    server = None
+                    if attempt:
+                        logger.error(f"发送邮件失败: {str(e)}", extra={"recipient": recipient_email, "duration_ms": _elapsed_ms(start)})
+    finally:
+        if server is not None:
+            try:
+                server.quit()
+            except OSError:
+                pass
+    return results
+
+
 def build_verification_email_template(verification_code: str, recipient_email: str, server_url: str = None) -> str:
     """
     构建验证码邮件模板
@@ -287,6 +349,7 @@ def send_confirmation_email(
         logger.error("邮箱授权码未配置，请在 config.py 中设置 EMAIL_PASSWORD")
         return False
     
+    start = time.perf_counter()
     try:
         # 构建邮件内容
         html_content = build_email_template(
@@ -322,17 +385,17 @@ def send_confirmation_email(
         server.sendmail(EMAIL_SENDER, recipient_email, message.as_string())
         server.quit()
         
-        logger.info(f"确认邮件已发送至: {recipient_email}")
+        logger.info("确认邮件已发送", extra={"recipient": recipient_email, "duration_ms": _elapsed_ms(start)})
         return True
         
     except smtplib.SMTPAuthenticationError:
-        logger.error("邮箱认证失败，请检查邮箱地址和授权码是否正确")
+        logger.error("邮箱认证失败，请检查邮箱地址和授权码是否正确", extra={"recipient": recipient_email, "duration_ms": _elapsed_ms(start)})
         return False
     except smtplib.SMTPException as e:
-        logger.error(f"SMTP错误: {str(e)}")
+        logger.error(f"SMTP错误: {str(e)}", extra={"recipient": recipient_email, "duration_ms": _elapsed_ms(start)})
         return False
     except Exception as e:
-        logger.error(f"发送邮件失败: {str(e)}")
+        logger.error(f"发送邮件失败: {str(e)}", extra={"recipient": recipient_email, "duration_ms": _elapsed_ms(start)})
         return False
 
 
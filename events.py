@@ -0,0 +1,169 @@
+"""
+团队主页实时更新（Server-Sent Events）
+
+进程内的发布/订阅总线：submit_work 等接口和后台任务按用户名发布事件，
+每个 SSE 连接订阅自己团队的事件。每个团队保留最近若干条事件，
+客户端断线重连时通过 Last-Event-ID 补发错过的事件。
+
+空闲连接只是一个挂起在 asyncio.Event 上的协程，单个 worker 可以同时保持大量连接。
+"""
+import asyncio
+import itertools
+import json
+from collections import deque
+from typing import AsyncIterator, Dict, Optional, Set
+
+# 事件ID带有进程启动标识，服务重启后旧的事件ID无法补发，客户端需要重新加载
+from cache import BOOT_ID
+
+# 每个团队保留的历史事件数（用于断线重连补发）
+HISTORY_SIZE = 50
+
+# 每个连接最多积压的未发送事件数，超出后通知客户端重新加载
+BACKLOG_SIZE = 100
+
+# 心跳间隔（秒）
+HEARTBEAT_INTERVAL = 15
+
+# 客户端重连等待时间（毫秒）
+RETRY_MS = 3000
+
+
+class Subscriber:
+    """一个 SSE 连接"""
+
+    def __init__(self, backlog: int = BACKLOG_SIZE):
+        self.queue = deque(maxlen=backlog)
+        self.wakeup = asyncio.Event()
+        self.overflowed = False
+
+    def push(self, event: dict) -> None:
+        if len(self.queue) == self.queue.maxlen:
+            self.overflowed = True
+        self.queue.append(event)
+        self.wakeup.set()
+
+
+class EventBus:
+    """按用户名分发事件的进程内总线（只能在事件循环线程中调用）"""
+
+    def __init__(self, history_size: int = HISTORY_SIZE, backlog_size: int = BACKLOG_SIZE):
+        self.history_size = history_size
+        self.backlog_size = backlog_size
+        self._ids = itertools.count(1)
+        self._history: Dict[str, deque] = {}
+        self._subscribers: Dict[str, Set[Subscriber]] = {}
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(subs) for subs in self._subscribers.values())
+
+    def publish(self, username: str, event_type: str, data: dict) -> None:
+        """
+        发布事件
+
+        Args:
+            username: 团队用户名
+            event_type: 事件类型，如 submission、scoring
+            data: 事件内容（可JSON序列化）
+        """
+        event = {"id": f"{BOOT_ID}-{next(self._ids)}", "event": event_type, "data": data}
+        history = self._history.get(username)
+        if history is None:
+            history = self._history[username] = deque(maxlen=self.history_size)
+        history.append(event)
+        for subscriber in self._subscribers.get(username, ()):
+            subscriber.push(event)
+
+    def subscribe(self, username: str) -> Subscriber:
+        subscriber = Subscriber(self.backlog_size)
+        self._subscribers.setdefault(username, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, username: str, subscriber: Subscriber) -> None:
+        subscribers = self._subscribers.get(username)
+        if subscribers:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[username]
+
+    def missed_since(self, username: str, last_event_id: str) -> Optional[list]:
+        """
+        返回 last_event_id 之后的历史事件
+
+        Returns:
+            list: 需要补发的事件；None 表示无法补发（已被淘汰或服务已重启），客户端应重新加载
+        """
+        boot_id, _, seq = last_event_id.partition("-")
+        if boot_id != BOOT_ID or not seq.isdigit():
+            return None
+        seq = int(seq)
+        history = list(self._history.get(username, ()))
+        if not history:
+            return []
+        oldest = int(history[0]["id"].split("-")[1])
+        if seq < oldest - 1:
+            return None
+        return [event for event in history if int(event["id"].split("-")[1]) > seq]
+
+
+def format_event(event: dict) -> str:
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
+
+
+def format_resync() -> str:
+    return "event: resync\ndata: {}\n\n"
+
+
+async def event_stream(bus: EventBus, username: str, last_event_id: Optional[str] = None,
+                       heartbeat: float = HEARTBEAT_INTERVAL) -> AsyncIterator[str]:
+    """
+    生成一个 SSE 连接的输出
+
+    Args:
+        bus: 事件总线
+        username: 订阅的团队
+        last_event_id: 客户端重连时带上的 Last-Event-ID
+        heartbeat: 心跳间隔（秒）
+    """
+    subscriber = bus.subscribe(username)
+    # 补发的事件可能同时出现在订阅队列中，记录已补发的ID避免重复发送
+    sent = set()
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+
+        if last_event_id:
+            missed = bus.missed_since(username, last_event_id)
+            if missed is None:
+                yield format_resync()
+            else:
+                for event in missed:
+                    sent.add(event["id"])
+                    yield format_event(event)
+
+        while True:
+            try:
+                await asyncio.wait_for(subscriber.wakeup.wait(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+
+            subscriber.wakeup.clear()
+            if subscriber.overflowed:
+                # 积压过多，丢弃积压的事件，让客户端重新加载
+                subscriber.queue.clear()
+                subscriber.overflowed = False
+                yield format_resync()
+                continue
+            while subscriber.queue:
+                event = subscriber.queue.popleft()
+                if event["id"] in sent:
+                    continue
+                yield format_event(event)
+            sent.clear()
+    finally:
+        bus.unsubscribe(username, subscriber)
+
+
+# 全局事件总线
+event_bus = EventBus()
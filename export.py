@@ -0,0 +1,179 @@
+"""
+流式导出注册信息、团队成员和提交记录
+
+每一行对应一个团队的一名成员（record_type=member）或一条提交（record_type=submission），
+没有成员的团队单独输出一行（record_type=team），
+团队信息平铺在每一行中。查询使用 yield_per 分批读取，输出边生成边写出，内存占用与数据量无关。
+
+命令行用法:
+    python export.py --format csv --gzip -o export.csv.gz
+    python export.py --format ndjson --include-unverified > export.ndjson
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+import zlib
+from typing import Iterator
+
+from sqlalchemy import select, literal, null, case
+
+from database import ReadSessionLocal, TeamRegistration, TeamMember, Submission
+
+# 每批从数据库读取的行数
+EXPORT_BATCH_SIZE = 1000
+
+# 导出字段（不包含密码）
+EXPORT_FIELDS = [
+    "record_type",
+    "team_id", "teamName", "organization", "orgAddress", "email", "username", "is_verified", "registered_at",
+    "member_name", "member_isLeader",
+    "submission_id", "submission_title", "submission_url", "submission_description", "submitted_at",
+]
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _team_columns():
+    return (
+        TeamRegistration.id.label("team_id"),
+        TeamRegistration.teamName,
+        TeamRegistration.organization,
+        TeamRegistration.orgAddress,
+        TeamRegistration.email,
+        TeamRegistration.username,
+        TeamRegistration.is_verified,
+        TeamRegistration.created_at.label("registered_at"),
+    )
+
+
+def iter_export_rows(include_unverified: bool = False) -> Iterator[dict]:
+    """
+    逐行生成导出数据
+
+    Args:
+        include_unverified: 是否包含未完成邮箱验证的团队
+
+    Yields:
+        dict: 字段见 EXPORT_FIELDS
+    """
+    # 没有成员的团队也输出一行，record_type 为 team
+    member_query = select(
+        case((TeamMember.id.is_(None), "team"), else_="member").label("record_type"),
+        *_team_columns(),
+        TeamMember.name.label("member_name"),
+        TeamMember.isLeader.label("member_isLeader"),
+        null().label("submission_id"),
+        null().label("submission_title"),
+        null().label("submission_url"),
+        null().label("submission_description"),
+        null().label("submitted_at"),
+    ).outerjoin(TeamMember, TeamMember.team_id == TeamRegistration.id).order_by(TeamRegistration.id, TeamMember.id)
+
+    submission_query = select(
+        literal("submission").label("record_type"),
+        *_team_columns(),
+        null().label("member_name"),
+        null().label("member_isLeader"),
+        Submission.id.label("submission_id"),
+        Submission.title.label("submission_title"),
+        Submission.url.label("submission_url"),
+        Submission.description.label("submission_description"),
+        Submission.created_at.label("submitted_at"),
+    ).join(TeamRegistration, TeamRegistration.username == Submission.username).order_by(Submission.id)
+
+    if not include_unverified:
+        member_query = member_query.where(TeamRegistration.is_verified == True)
+        submission_query = submission_query.where(TeamRegistration.is_verified == True)
+
+    db = ReadSessionLocal()
+    try:
+        for query in (member_query, submission_query):
+            result = db.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            for row in result.mappings():
+                yield {
+                    key: (value.isoformat() if hasattr(value, "isoformat") else value)
+                    for key, value in row.items()
+                }
+    finally:
+        db.close()
+
+
+def iter_csv(rows: Iterator[dict]) -> Iterator[bytes]:
+    """把行数据编码为CSV，每批输出一次"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def iter_ndjson(rows: Iterator[dict]) -> Iterator[bytes]:
+    """把行数据编码为NDJSON，每批输出一次"""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row, ensure_ascii=False))
+        if len(lines) >= EXPORT_BATCH_SIZE:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def iter_gzip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """边生成边进行gzip压缩"""
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip 格式
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def iter_export(fmt: str = "csv", gzip: bool = False, include_unverified: bool = False) -> Iterator[bytes]:
+    """
+    生成导出文件内容
+
+    Args:
+        fmt: csv 或 ndjson
+        gzip: 是否gzip压缩
+        include_unverified: 是否包含未验证团队
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    rows = iter_export_rows(include_unverified)
+    chunks = iter_csv(rows) if fmt == "csv" else iter_ndjson(rows)
+    return iter_gzip(chunks) if gzip else chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出注册信息、团队成员和提交记录")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="csv", help="导出格式")
+    parser.add_argument("--gzip", action="store_true", help="gzip压缩输出")
+    parser.add_argument("--include-unverified", action="store_true", help="包含未完成邮箱验证的团队")
+    parser.add_argument("-o", "--output", help="输出文件路径，默认输出到标准输出")
+    args = parser.parse_args()
+
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in iter_export(args.format, args.gzip, args.include_unverified):
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
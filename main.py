@@ -1,15 +1,26 @@
-from fastapi import FastAPI, HTTPException, Depends, status, Request, Response
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import FastAPI, HTTPException, Depends, Header, status, Request, Response, BackgroundTasks
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse, FileResponse, JSONResponse, PlainTextResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from pydantic import BaseModel, EmailStr
-from typing import List, Optional
-from sqlalchemy.orm import Session
+from pydantic.networks import validate_email
+from pydantic_core import PydanticCustomError
+from typing import List, Optional, Tuple
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime, timedelta
+import asyncio
+import hashlib
+import json
+import logging
+import os
 import secrets
+import tempfile
 import uuid
 
 # 导入数据库相关
-from database import init_db, get_db, TeamRegistration, TeamMember, VerificationCode, Submission
+from database import init_db, get_db, SessionLocal, TeamRegistration, TeamMember, VerificationCode, Submission, SubmissionUpload, ScoringJob
 
 # 导入邮件服务
 from email_service import send_verification_email, generate_verification_code
@@ -17,6 +28,67 @@ from email_service import send_verification_email, generate_verification_code
 # 导入配置
 from config import DOCS_USERNAME, DOCS_PASSWORD, SERVER_URL
 
+# 导入数据导出
+from export import iter_export, EXPORT_FORMATS
+
+# 导入分块上传存储
+import uploads
+
+# 导入评分任务队列
+from scoring import enqueue_scoring
+
+# 导入用户名/邮箱索引
+from user_index import registration_index
+
+# 导入团队主页实时事件
+from events import event_bus, event_stream
+
+# 导入数据库快照
+import snapshots
+
+# 导入团队数据缓存
+from cache import team_cache, etag_matches, recent_submissions
+
+# 导入统计数据缓存
+from stats import stats_cache
+
+# 导入结构化日志
+from app_logging import setup_logging, shutdown_logging, RequestContextMiddleware
+
+# 导入全文搜索
+from search import ensure_search_index, search_teams, SEARCH_MAX_LIMIT
+
+# 导入变更日志
+from changes import (
+    record_change, team_state, submission_state, fetch_changes, compact_changes, change_notifier,
+    CHANGES_MAX_LIMIT, CHANGES_MAX_WAIT, CHANGES_COMPACT_INTERVAL
+)
+
+# 导入邮箱域名检查
+from email_check import deliverability_checker
+
+# 导入准入控制
+from admission import AdmissionControlMiddleware, admission_controller
+
+# 导入性能分析
+import profiling
+
+# 导入提交记录的组提交
+from submission_batch import (
+    submission_batcher, find_idempotency_key, remember_idempotency_key, purge_idempotency_keys, IdempotencyKeyConflict
+)
+
+# 导入注册数据模型和批量导入
+from schemas import RegistrationData
+import bulk_import
+
+logger = logging.getLogger("main")
+
+# 本进程中正在写入的提交：{(username, Idempotency-Key) 或 (username, url, title): (请求指纹, 写入任务)}
+# 并发到达的重复提交（例如网络不稳定时客户端的重试）等待第一个请求的结果，不再重复写库；
+# 落到其他 worker 上的重试由幂等键表的唯一约束保证只写入一次
+inflight_submissions = {}
+
 # 存储一次性访问token (实际生产环境应使用Redis等缓存)
 # 格式: {token: {"username": str, "expires": datetime}}
 docs_tokens = {}
@@ -72,11 +144,94 @@ app = FastAPI(
     redoc_url=None,  # 禁用默认的 /redoc
 )
 
+# 按路由限制并发，过载时快速返回503（后添加的中间件在外层，被拒绝的请求也会记录访问日志）
+app.add_middleware(AdmissionControlMiddleware)
+
+# 为每个请求分配请求ID并记录访问日志
+app.add_middleware(RequestContextMiddleware)
+
 # 初始化数据库
 @app.on_event("startup")
 async def startup_event():
+    setup_logging()
     init_db()
-    print("数据库初始化完成")
+    if ensure_search_index():
+        logger.info("搜索索引已创建")
+    logger.info("数据库初始化完成")
+    registration_index.load()
+    app.state.scoring_watcher = asyncio.create_task(watch_scoring_jobs())
+    app.state.snapshot_task = asyncio.create_task(periodic_snapshots()) if SNAPSHOT_INTERVAL else None
+    app.state.compact_task = asyncio.create_task(periodic_compaction())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.scoring_watcher.cancel()
+    if app.state.snapshot_task:
+        app.state.snapshot_task.cancel()
+    app.state.compact_task.cancel()
+    # 写入还在等待攒批的提交
+    submission_batcher.flush()
+    shutdown_logging()
+
+# 定时快照间隔（秒），0 表示不在服务内定时快照（也可以单独运行 python snapshots.py --every 3600）
+SNAPSHOT_INTERVAL = 0
+
+async def periodic_snapshots():
+    while True:
+        await asyncio.sleep(SNAPSHOT_INTERVAL)
+        try:
+            info = await run_in_threadpool(snapshots.create_snapshot, keep=snapshots.SNAPSHOT_KEEP)
+            logger.info("数据库快照已创建", extra={"snapshot": info["name"], "duration_ms": info["seconds"] * 1000})
+        except snapshots.SnapshotError as e:
+            logger.warning(f"数据库快照失败: {str(e)}")
+
+# 定期压缩变更日志
+async def periodic_compaction():
+    while True:
+        await asyncio.sleep(CHANGES_COMPACT_INTERVAL)
+        db = SessionLocal()
+        try:
+            removed = compact_changes(db)
+            logger.info("变更日志已压缩", extra={"removed": removed})
+            removed = purge_idempotency_keys(db)
+            logger.info("过期的幂等键已删除", extra={"removed": removed})
+        except Exception as e:
+            logger.warning(f"变更日志压缩失败: {str(e)}")
+        finally:
+            db.close()
+
+# 评分在独立进程中进行，定期检查评分任务的变化并推送给对应团队
+SCORING_WATCH_INTERVAL = 2  # 秒
+
+def scoring_summary(job: ScoringJob) -> dict:
+    return {
+        "status": job.status,
+        "progress": job.progress,
+        "score": job.score
+    }
+
+async def watch_scoring_jobs():
+    since = datetime.utcnow()
+    while True:
+        await asyncio.sleep(SCORING_WATCH_INTERVAL)
+        db = SessionLocal()
+        try:
+            changes = db.query(ScoringJob, Submission.username).join(
+                Submission, Submission.id == ScoringJob.submission_id
+            ).filter(
+                ScoringJob.updated_at > since
+            ).order_by(ScoringJob.updated_at).all()
+        except Exception as e:
+            logger.warning(f"查询评分任务失败: {str(e)}")
+            continue
+        finally:
+            db.close()
+        
+        for job, username in changes:
+            since = max(since, job.updated_at)
+            # 每个 worker 都会查到同样的变化，不需要通知其他进程
+            team_cache.invalidate(username, broadcast=False)
+            event_bus.publish(username, "scoring", dict(submissionId=job.submission_id, **scoring_summary(job)))
 
 # 受保护的文档路由
 from fastapi.openapi.docs import get_swagger_ui_html, get_redoc_html
@@ -156,19 +311,6 @@ async def root():
     return {"message": "Server is running normally", "status": "ok"}
 
 # 定义API数据模型（Pydantic）
-class Member(BaseModel):
-    name: str
-    isLeader: bool = False
-
-class RegistrationData(BaseModel):
-    teamName: str
-    organization: str
-    orgAddress: str = ""
-    email: EmailStr
-    username: str
-    password: str
-    members: List[Member]
-
 class VerifyCodeData(BaseModel):
     email: EmailStr
     code: str
@@ -184,6 +326,15 @@ class SubmissionData(BaseModel):
     url: str
     description: str = ""
 
+class UploadStartData(BaseModel):
+    username: str
+    filename: str
+    size: int
+
+class UploadCompleteData(BaseModel):
+    title: str
+    description: str = ""
+
 # 响应模型
 class MemberResponse(BaseModel):
     name: str
@@ -227,78 +378,122 @@ async def serve_dashboard_page():
     with open("dashboard.html", "r", encoding="utf-8") as f:
         return f.read()
 
+# 检查用户名/邮箱是否可用
+@app.get("/api/check-availability")
+async def check_availability(username: Optional[str] = None, email: Optional[str] = None):
+    if username is None and email is None:
+        raise HTTPException(status_code=400, detail="Provide username and/or email")
+    
+    result = {}
+    if username is not None:
+        result["username"] = {"value": username, "available": not registration_index.username_taken(username)}
+    if email is not None:
+        # 与注册时 EmailStr 的规范化保持一致
+        try:
+            email = validate_email(email)[1]
+        except PydanticCustomError:
+            raise HTTPException(status_code=400, detail="Invalid email address")
+        deliverable = (await deliverability_checker.check_email(email)).deliverable
+        result["email"] = {
+            "value": email,
+            "available": not registration_index.email_taken(email) and deliverable is not False,
+            "deliverable": deliverable
+        }
+    
+    return {
+        "status": "success",
+        "data": result
+    }
+
+def registration_conflict_detail(error: IntegrityError) -> str:
+    """把唯一约束冲突转换为与原先一致的错误提示"""
+    message = str(error.orig)
+    if "team_registrations.username" in message:
+        return "Username already exists"
+    if "team_registrations.email" in message:
+        return "Email already registered"
+    return "Registration conflicts with an existing team"
+
 # 第一步：接收注册数据，发送验证码
 @app.post("/api/register")
 async def register_team(data: RegistrationData, db: Session = Depends(get_db)):
-    # 检查用户名是否已存在
-    existing_username = db.query(TeamRegistration).filter(
-        TeamRegistration.username == data.username
-    ).first()
-    if existing_username:
+    # 先查内存索引，明显重复时不必访问数据库
+    if registration_index.username_taken(data.username):
         raise HTTPException(status_code=400, detail="Username already exists")
-    
-    # 检查邮箱是否已存在
-    existing_email = db.query(TeamRegistration).filter(
-        TeamRegistration.email == data.email
-    ).first()
-    if existing_email:
+    if registration_index.email_taken(data.email):
         raise HTTPException(status_code=400, detail="Email already registered")
     
+    # 邮箱域名无法接收邮件时不必发送验证码（DNS 无法判断时放行）
+    if (await deliverability_checker.check_email(data.email)).deliverable is False:
+        raise HTTPException(status_code=400, detail="Email domain cannot receive mail, please check the address")
+    
     # 生成验证码
     verification_code = generate_verification_code(6)
     
     # 保存验证码到数据库（有效期10分钟）
     expires_at = datetime.utcnow() + timedelta(minutes=10)
     
-    # 删除该邮箱之前的未使用验证码
-    db.query(VerificationCode).filter(
-        VerificationCode.email == data.email,
-        VerificationCode.is_used == False
-    ).delete()
-    
-    db_code = VerificationCode(
-        email=data.email,
-        code=verification_code,
-        expires_at=expires_at
-    )
-    db.add(db_code)
-    
-    # 暂存注册信息（未验证状态）
-    db_team = TeamRegistration(
-        teamName=data.teamName,
-        organization=data.organization,
-        orgAddress=data.orgAddress,
-        email=data.email,
-        username=data.username,
-        password=data.password,
-        is_verified=False  # 标记为未验证
-    )
-    
-    # 添加成员
-    for member_data in data.members:
-        db_member = TeamMember(
-            name=member_data.name,
-            isLeader=member_data.isLeader
+    # 用户名/邮箱去重交给唯一约束，在同一个事务中完成所有写入，避免先查后插的竞争
+    try:
+        # 暂存注册信息（未验证状态），flush 后即可拿到团队ID，重复时在此处抛出 IntegrityError
+        db_team = TeamRegistration(
+            teamName=data.teamName,
+            organization=data.organization,
+            orgAddress=data.orgAddress,
+            email=data.email,
+            username=data.username,
+            password=data.password,
+            is_verified=False  # 标记为未验证
         )
-        db_team.members.append(db_member)
+        db.add(db_team)
+        db.flush()
+        
+        # 一条语句批量插入成员
+        if data.members:
+            db.execute(
+                insert(TeamMember),
+                [
+                    {"team_id": db_team.id, "name": member_data.name, "isLeader": member_data.isLeader}
+                    for member_data in data.members
+                ]
+            )
+        
+        # 删除该邮箱之前的未使用验证码
+        db.query(VerificationCode).filter(
+            VerificationCode.email == data.email,
+            VerificationCode.is_used == False
+        ).delete(synchronize_session=False)
+        
+        db.add(VerificationCode(
+            email=data.email,
+            code=verification_code,
+            expires_at=expires_at
+        ))
+        
+        record_change(db, "team", data.username, "registered", team_state(db_team, data.members))
+        
+        # 保存到数据库
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=registration_conflict_detail(e))
     
-    # 保存到数据库
-    db.add(db_team)
-    db.commit()
-    db.refresh(db_code)
+    registration_index.add(data.username, data.email)
+    stats_cache.mark_dirty()
+    change_notifier.notify()
     
-    # 发送验证码邮件
+    # 发送验证码邮件（SMTP 是阻塞调用，放到线程池中，不阻塞事件循环上的其他请求）
     try:
-        email_sent = send_verification_email(data.email, verification_code, SERVER_URL)
+        email_sent = await run_in_threadpool(send_verification_email, data.email, verification_code, SERVER_URL)
         
         if email_sent:
-            print(f"✅ 验证码已发送至: {data.email}")
+            logger.info("验证码已发送", extra={"username": data.username, "email": data.email})
         else:
-            print(f"⚠️ 验证码发送失败: {data.email}")
+            logger.warning("验证码发送失败", extra={"username": data.username, "email": data.email})
             raise HTTPException(status_code=500, detail="Failed to send verification code, please try again later")
             
     except Exception as e:
-        print(f"❌ 邮件发送异常: {str(e)}")
+        logger.exception(f"邮件发送异常: {str(e)}", extra={"username": data.username, "email": data.email})
         raise HTTPException(status_code=500, detail="Failed to send verification code, please try again later")
     
     return {
@@ -372,9 +567,16 @@ async def verify_code(data: VerifyCodeData, db: Session = Depends(get_db)):
     # 标记注册信息为已验证
     db_team.is_verified = True
     
+    record_change(db, "team", db_team.username, "verified", team_state(db_team, db_team.members))
     db.commit()
     db.refresh(db_team)
     
+    # 团队状态变化，清除缓存
+    team_cache.invalidate(db_team.username)
+    registration_index.mark_verified(db_team.username)
+    stats_cache.mark_dirty()
+    change_notifier.notify()
+    
     return {
         "status": "success",
         "message": "Registration successful!",
@@ -471,90 +673,477 @@ async def delete_registration(username: str, db: Session = Depends(get_db)):
 
 # 获取团队成员信息
 @app.get("/api/team/{username}/members")
-async def get_team_members(username: str, db: Session = Depends(get_db)):
-    team = db.query(TeamRegistration).filter(
-        TeamRegistration.username == username,
-        TeamRegistration.is_verified == True
-    ).first()
+async def get_team_members(username: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    # 客户端缓存仍有效时直接返回304，不访问数据库
+    etag = team_cache.etag(username, "members")
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
     
-    if not team:
-        raise HTTPException(status_code=404, detail="Team not found")
-    
-    return {
-        "status": "success",
-        "data": [
+    members = team_cache.get(username, "members")
+    if members is None:
+        team = db.query(TeamRegistration).filter(
+            TeamRegistration.username == username,
+            TeamRegistration.is_verified == True
+        ).first()
+        
+        if not team:
+            raise HTTPException(status_code=404, detail="Team not found")
+        
+        members = [
             {
                 "name": member.name,
                 "isLeader": member.isLeader
             }
             for member in team.members
         ]
+        team_cache.set(username, "members", members)
+    
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    return {
+        "status": "success",
+        "data": members
     }
 
-# 提交作品链接
-@app.post("/api/submission")
-async def submit_work(data: SubmissionData, db: Session = Depends(get_db)):
-    # 验证用户是否存在
-    user = db.query(TeamRegistration).filter(
-        TeamRegistration.username == data.username,
-        TeamRegistration.is_verified == True
-    ).first()
+# 个人主页数据：团队信息、成员和最近的提交记录，一次请求返回
+@app.get("/api/dashboard/{username}")
+async def get_dashboard(username: str, request: Request, response: Response, limit: int = 20, db: Session = Depends(get_db)):
+    limit = max(1, min(limit, 100))
     
-    if not user:
-        raise HTTPException(status_code=404, detail="用户不存在或未验证")
-    
-    # 创建提交记录
-    submission = Submission(
-        username=data.username,
-        title=data.title,
-        url=data.url,
-        description=data.description
-    )
+    # 客户端缓存仍有效时直接返回304，不访问数据库
+    kind = f"dashboard:{limit}"
+    etag = team_cache.etag(username, kind)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
     
-    db.add(submission)
-    db.commit()
-    db.refresh(submission)
+    dashboard = team_cache.get(username, kind)
+    if dashboard is None:
+        if not registration_index.is_verified(username):
+            raise HTTPException(status_code=404, detail="Team not found")
+        
+        # 成员通过 selectinload 随团队一起加载
+        team = db.query(TeamRegistration).options(
+            selectinload(TeamRegistration.members)
+        ).filter(
+            TeamRegistration.username == username,
+            TeamRegistration.is_verified == True
+        ).first()
+        
+        if not team:
+            raise HTTPException(status_code=404, detail="Team not found")
+        
+        # 只加载最新的 limit 条提交及其评分任务，开销与 limit 相关，与提交总数无关
+        submissions = db.query(Submission).options(
+            selectinload(Submission.scoring_jobs)
+        ).filter(
+            Submission.username == username
+        ).order_by(Submission.created_at.desc(), Submission.id.desc()).limit(limit).all()
+        submission_total = db.query(func.count(Submission.id)).filter(Submission.username == username).scalar()
+        
+        dashboard = {
+            "team": {
+                "teamName": team.teamName,
+                "organization": team.organization,
+                "orgAddress": team.orgAddress,
+                "email": team.email,
+                "username": team.username
+            },
+            "members": [
+                {
+                    "name": member.name,
+                    "isLeader": member.isLeader
+                }
+                for member in team.members
+            ],
+            "submissions": [
+                {
+                    "id": sub.id,
+                    "title": sub.title,
+                    "url": sub.url,
+                    "description": sub.description,
+                    "created_at": sub.created_at.isoformat(),
+                    "scoring": scoring_summary(max(sub.scoring_jobs, key=lambda job: job.id)) if sub.scoring_jobs else None
+                }
+                for sub in submissions
+            ],
+            "submissionTotal": submission_total
+        }
+        team_cache.set(username, kind, dashboard)
     
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    return {
+        "status": "success",
+        "data": dashboard
+    }
+
+def submission_fingerprint(data: SubmissionData) -> str:
+    """请求指纹：同一个 Idempotency-Key 用于不同内容时拒绝"""
+    return hashlib.sha256(json.dumps([data.title, data.url, data.description]).encode("utf-8")).hexdigest()
+
+def submission_result(state: dict) -> dict:
     return {
         "status": "success",
         "message": "Submission successful",
         "data": {
-            "id": submission.id,
-            "title": submission.title,
-            "url": submission.url,
-            "created_at": submission.created_at.isoformat()
+            "id": state["id"],
+            "title": state["title"],
+            "url": state["url"],
+            "created_at": state["created_at"]
         }
     }
 
-# 获取用户的提交历史
-@app.get("/api/submission/{username}")
-async def get_submissions(username: str, db: Session = Depends(get_db)):
+def remember_replay_key(replay_key: Optional[tuple], fingerprint: str, result: dict) -> None:
+    """复用其他请求的结果时，把幂等键也指向该提交，之后的重试在任何 worker 上都返回同一结果"""
+    if not replay_key:
+        return
+    db = SessionLocal()
+    try:
+        remember_idempotency_key(db, *replay_key, fingerprint, result["data"]["id"])
+    finally:
+        db.close()
+
+# 提交作品链接
+@app.post("/api/submission")
+async def submit_work(
+    data: SubmissionData,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None)
+):
+    # 客户端重试时携带相同的 Idempotency-Key，直接返回第一次的结果，不再写库。
+    # 幂等键保存在数据库中，重试落到其他 worker 上也能找到
+    fingerprint = submission_fingerprint(data)
+    replay_key = (data.username, idempotency_key) if idempotency_key else None
+    if replay_key:
+        db = SessionLocal()
+        try:
+            existing = find_idempotency_key(db, *replay_key)
+        finally:
+            db.close()
+        if existing:
+            existing_fingerprint, state = existing
+            if existing_fingerprint != fingerprint:
+                raise HTTPException(status_code=422, detail="Idempotency-Key has already been used for a different submission")
+            response.headers["Idempotent-Replayed"] = "true"
+            return submission_result(state)
+    
+    # 短时间内相同的提交视为重复提交
+    dedup_key = (data.username, data.url, data.title)
+    cached_result = recent_submissions.get(dedup_key)
+    if cached_result:
+        remember_replay_key(replay_key, fingerprint, cached_result)
+        response.headers["Idempotent-Replayed"] = "true"
+        return cached_result
+    
+    # 同样的提交正在本进程中写入，等待它的结果
+    for key in (replay_key, dedup_key):
+        inflight = inflight_submissions.get(key) if key else None
+        if inflight:
+            inflight_fingerprint, task = inflight
+            if key is replay_key and inflight_fingerprint != fingerprint:
+                raise HTTPException(status_code=422, detail="Idempotency-Key has already been used for a different submission")
+            try:
+                result, _ = await asyncio.shield(task)
+            except IdempotencyKeyConflict:
+                if key is replay_key:
+                    raise HTTPException(status_code=422, detail="Idempotency-Key has already been used for a different submission")
+                # 内容相同的请求所带的幂等键无效，本请求自己写入
+                break
+            if key is not replay_key:
+                remember_replay_key(replay_key, fingerprint, result)
+            response.headers["Idempotent-Replayed"] = "true"
+            return result
+    
     # 验证用户是否存在
-    user = db.query(TeamRegistration).filter(
-        TeamRegistration.username == username,
-        TeamRegistration.is_verified == True
-    ).first()
+    if not registration_index.is_verified(data.username):
+        raise HTTPException(status_code=404, detail="用户不存在或未验证")
     
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    # 在写库之前登记，检查与登记之间没有 await，不会有其他请求插入。
+    # 写入放在独立的任务中，发起请求的客户端断开后重复的请求仍能拿到结果
+    task = asyncio.create_task(create_submission(data, dedup_key, idempotency_key, fingerprint))
+    keys = [key for key in (replay_key, dedup_key) if key]
+    for key in keys:
+        inflight_submissions.setdefault(key, (fingerprint, task))
     
-    # 获取该用户的所有提交记录，按时间倒序
-    submissions = db.query(Submission).filter(
-        Submission.username == username
-    ).order_by(Submission.created_at.desc()).all()
+    def release(_):
+        for key in keys:
+            if inflight_submissions.get(key, (None, None))[1] is task:
+                del inflight_submissions[key]
+    task.add_done_callback(release)
     
-    return {
-        "status": "success",
-        "data": [
+    try:
+        result, replayed = await asyncio.shield(task)
+    except IdempotencyKeyConflict:
+        raise HTTPException(status_code=422, detail="Idempotency-Key has already been used for a different submission")
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+async def create_submission(data: SubmissionData, dedup_key: tuple, idempotency_key: Optional[str],
+                            fingerprint: str) -> Tuple[dict, bool]:
+    """写入提交记录并记录结果，供重试和重复提交复用；返回结果以及是否为其他 worker 已写入的提交"""
+    # 创建提交记录和幂等键（与同时到达的其他提交合并为一个事务提交）
+    submission, replayed = await submission_batcher.submit(
+        data.username, data.title, data.url, data.description,
+        idempotency_key=idempotency_key, fingerprint=fingerprint
+    )
+    result = submission_result(submission)
+    
+    # 记录结果，供重复提交复用
+    recent_submissions.set(dedup_key, result)
+    if replayed:
+        return result, True
+    
+    # 提交历史变化，清除缓存
+    team_cache.invalidate(data.username)
+    stats_cache.mark_dirty()
+    change_notifier.notify()
+    
+    event_bus.publish(data.username, "submission", {**result["data"], "description": data.description})
+    
+    return result, False
+
+# 获取用户的提交历史
+@app.get("/api/submission/{username}")
+async def get_submissions(username: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    # 客户端缓存仍有效时直接返回304，不访问数据库
+    etag = team_cache.etag(username, "submissions")
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    history = team_cache.get(username, "submissions")
+    if history is None:
+        # 验证用户是否存在
+        if not registration_index.is_verified(username):
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        # 获取该用户的所有提交记录，按时间倒序
+        submissions = db.query(Submission).filter(
+            Submission.username == username
+        ).order_by(Submission.created_at.desc()).all()
+        
+        # 每个提交最新的评分任务
+        jobs = {}
+        if submissions:
+            for job in db.query(ScoringJob).filter(
+                ScoringJob.submission_id.in_([sub.id for sub in submissions])
+            ).order_by(ScoringJob.id):
+                jobs[job.submission_id] = job
+        
+        history = [
             {
                 "id": sub.id,
                 "title": sub.title,
                 "url": sub.url,
                 "description": sub.description,
-                "created_at": sub.created_at.isoformat()
+                "created_at": sub.created_at.isoformat(),
+                "scoring": scoring_summary(jobs[sub.id]) if sub.id in jobs else None
             }
             for sub in submissions
         ]
+        team_cache.set(username, "submissions", history)
+    
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    return {
+        "status": "success",
+        "data": history
+    }
+
+# 团队主页实时更新（SSE），断线重连时浏览器会自动带上 Last-Event-ID
+@app.get("/api/events/{username}")
+async def team_events(username: str, request: Request):
+    if not registration_index.is_verified(username):
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    return StreamingResponse(
+        event_stream(event_bus, username, request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # 关闭反向代理缓冲
+        }
+    )
+
+def upload_status(upload: SubmissionUpload) -> dict:
+    return {
+        "uploadId": upload.id,
+        "filename": upload.filename,
+        "size": upload.total_size,
+        "offset": upload.received,
+        "completed": upload.completed_at is not None,
+        "sha256": upload.sha256,
+        "submissionId": upload.submission_id
+    }
+
+def get_upload_or_404(upload_id: str, db: Session) -> SubmissionUpload:
+    upload = db.query(SubmissionUpload).filter(SubmissionUpload.id == upload_id).first()
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return upload
+
+# 创建分块上传会话
+@app.post("/api/upload")
+async def start_upload(data: UploadStartData, db: Session = Depends(get_db)):
+    if not registration_index.is_verified(data.username):
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    if data.size <= 0 or data.size > uploads.MAX_UPLOAD_SIZE:
+        raise HTTPException(status_code=400, detail=f"File size must be between 1 and {uploads.MAX_UPLOAD_SIZE} bytes")
+    
+    upload = SubmissionUpload(
+        id=uuid.uuid4().hex,
+        username=data.username,
+        filename=os.path.basename(data.filename) or "submission",
+        total_size=data.size,
+        received=0
+    )
+    uploads.start_upload(upload.id)
+    db.add(upload)
+    db.commit()
+    
+    return {
+        "status": "success",
+        "data": dict(upload_status(upload), chunkSize=uploads.CHUNK_SIZE)
+    }
+
+# 查询上传进度（断点续传时获取偏移量）
+@app.get("/api/upload/{upload_id}")
+async def get_upload(upload_id: str, db: Session = Depends(get_db)):
+    upload = get_upload_or_404(upload_id, db)
+    return {
+        "status": "success",
+        "data": upload_status(upload)
+    }
+
+# 上传一个分块，请求体为原始字节，offset 为分块在文件中的起始位置
+@app.put("/api/upload/{upload_id}")
+async def upload_chunk(upload_id: str, offset: int, request: Request, db: Session = Depends(get_db)):
+    upload = get_upload_or_404(upload_id, db)
+    
+    if upload.completed_at is not None:
+        raise HTTPException(status_code=409, detail="Upload already completed")
+    
+    async with uploads.get_lock(upload_id):
+        db.refresh(upload)
+        if upload.completed_at is not None:
+            raise HTTPException(status_code=409, detail="Upload already completed")
+        try:
+            position = await uploads.write_chunk(
+                upload_id, offset, upload.received, upload.total_size, request.stream()
+            )
+        except uploads.UploadOffsetError as e:
+            return JSONResponse(status_code=409, content={"detail": "Offset mismatch", "offset": e.expected})
+        except uploads.UploadTooLargeError:
+            raise HTTPException(status_code=413, detail="Chunk exceeds declared file size")
+        
+        upload.received = position
+        db.commit()
+    
+    return {
+        "status": "success",
+        "data": upload_status(upload)
+    }
+
+# 完成上传并生成提交记录
+@app.post("/api/upload/{upload_id}/complete")
+async def complete_upload(upload_id: str, data: UploadCompleteData, db: Session = Depends(get_db)):
+    upload = get_upload_or_404(upload_id, db)
+    
+    if upload.completed_at is not None:
+        return {
+            "status": "success",
+            "data": upload_status(upload)
+        }
+    
+    if upload.received != upload.total_size:
+        raise HTTPException(status_code=400, detail=f"Upload incomplete: {upload.received}/{upload.total_size} bytes received")
+    
+    async with uploads.get_lock(upload_id):
+        # 并发的完成请求在等锁期间可能已经完成了上传
+        db.refresh(upload)
+        if upload.completed_at is not None:
+            return {
+                "status": "success",
+                "data": upload_status(upload)
+            }
+        
+        sha256, duplicate = await run_in_threadpool(uploads.finish_upload, upload_id, upload.received)
+        
+        submission = Submission(
+            username=upload.username,
+            title=data.title,
+            url=f"{SERVER_URL}/api/upload/{upload_id}/file",
+            description=data.description
+        )
+        db.add(submission)
+        db.flush()
+        
+        upload.sha256 = sha256
+        upload.submission_id = submission.id
+        upload.completed_at = datetime.utcnow()
+        
+        # 上传的预测文件进入评分队列
+        enqueue_scoring(db, submission.id)
+        record_change(db, "submission", submission.id, "submitted", submission_state(submission))
+        db.commit()
+    
+    # 完成状态已提交，之后的请求在加锁前就会直接返回
+    uploads.release_lock(upload_id)
+    
+    # 提交历史变化，清除缓存
+    team_cache.invalidate(upload.username)
+    stats_cache.mark_dirty()
+    change_notifier.notify()
+    event_bus.publish(upload.username, "submission", {
+        "id": submission.id,
+        "title": submission.title,
+        "url": submission.url,
+        "description": submission.description,
+        "created_at": submission.created_at.isoformat()
+    })
+    
+    return {
+        "status": "success",
+        "message": "Submission successful",
+        "data": dict(upload_status(upload), duplicate=duplicate)
+    }
+
+# 下载已上传的提交文件
+@app.get("/api/upload/{upload_id}/file")
+async def download_upload(upload_id: str, db: Session = Depends(get_db)):
+    upload = get_upload_or_404(upload_id, db)
+    
+    if upload.completed_at is None:
+        raise HTTPException(status_code=404, detail="Upload not completed")
+    
+    return FileResponse(uploads.stored_path(upload.sha256), filename=upload.filename)
+
+# 查询提交的评分状态和结果
+@app.get("/api/scoring/{submission_id}")
+async def get_scoring_status(submission_id: int, db: Session = Depends(get_db)):
+    job = db.query(ScoringJob).filter(
+        ScoringJob.submission_id == submission_id
+    ).order_by(ScoringJob.id.desc()).first()
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="No scoring job for this submission")
+    
+    return {
+        "status": "success",
+        "data": {
+            "submissionId": job.submission_id,
+            "status": job.status,
+            "progress": job.progress,
+            "attempts": job.attempts,
+            "error": job.error,
+            "clsScore": job.cls_score,
+            "segScore": job.seg_score,
+            "score": job.score,
+            "metrics": json.loads(job.metrics) if job.metrics else None,
+            "createdAt": job.created_at.isoformat(),
+            "finishedAt": job.finished_at.isoformat() if job.finished_at else None
+        }
     }
 
 # 获取所有提交记录（管理接口）
@@ -577,3 +1166,255 @@ async def get_all_submissions(db: Session = Depends(get_db)):
             for sub in submissions
         ]
     }
+
+# 变更日志：返回游标之后的注册、验证、提交记录，wait > 0 时没有新变更会等待（长轮询，管理接口）
+@app.get("/api/changes")
+async def get_changes(cursor: int = 0, limit: int = 100, wait: float = 0, username: str = Depends(verify_docs_credentials)):
+    limit = max(1, min(limit, CHANGES_MAX_LIMIT))
+    wait = max(0, min(wait, CHANGES_MAX_WAIT))
+    
+    if wait:
+        items, next_cursor, has_more = await change_notifier.wait_for_changes(cursor, limit, wait)
+    else:
+        db = SessionLocal()
+        try:
+            items, next_cursor, has_more = fetch_changes(db, cursor, limit)
+        finally:
+            db.close()
+    
+    return {
+        "status": "success",
+        "cursor": next_cursor,
+        "hasMore": has_more,
+        "data": items
+    }
+
+# 统计数据：各单位团队数、每日注册数、验证转化率、每小时提交数（管理接口）
+@app.get("/api/stats")
+async def get_stats(request: Request, response: Response, username: str = Depends(verify_docs_credentials)):
+    # 缓存有效时不访问数据库
+    if stats_cache.is_fresh() and etag_matches(request.headers.get("if-none-match"), stats_cache.etag):
+        return Response(status_code=304, headers={"ETag": stats_cache.etag})
+    
+    data = await run_in_threadpool(stats_cache.get)
+    
+    response.headers["ETag"] = stats_cache.etag
+    response.headers["Cache-Control"] = "no-cache"
+    return {
+        "status": "success",
+        "data": data
+    }
+
+# 按队名、单位、成员姓名、提交标题等搜索团队（管理接口）
+@app.get("/api/admin/search")
+async def search(q: str, limit: int = 20, offset: int = 0, db: Session = Depends(get_db), username: str = Depends(verify_docs_credentials)):
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    offset = max(0, offset)
+    
+    total, results = search_teams(db, q, limit=limit, offset=offset)
+    return {
+        "status": "success",
+        "total": total,
+        "data": results
+    }
+
+# 邮箱域名检查缓存命中率（管理接口）
+@app.get("/api/admin/email-check")
+async def get_email_check_stats(username: str = Depends(verify_docs_credentials)):
+    return {
+        "status": "success",
+        "data": deliverability_checker.stats()
+    }
+
+# 提交记录组提交的批次统计（管理接口）
+@app.get("/api/admin/submission-batch")
+async def get_submission_batch_stats(username: str = Depends(verify_docs_credentials)):
+    return {
+        "status": "success",
+        "data": submission_batcher.stats()
+    }
+
+# 准入控制状态：各类请求的并发上限、排队数和拒绝数（管理接口）
+@app.get("/api/admin/admission")
+async def get_admission_status(username: str = Depends(verify_docs_credentials)):
+    return {
+        "status": "success",
+        "data": admission_controller.snapshot()
+    }
+
+# CPU 采样分析：采样 seconds 秒，返回折叠栈文本，可直接生成火焰图（管理接口）
+@app.get("/api/admin/profile/cpu", response_class=PlainTextResponse)
+async def profile_cpu(
+    seconds: float = 10,
+    interval: float = profiling.PROFILE_INTERVAL,
+    lines: bool = False,
+    username: str = Depends(verify_docs_credentials)
+):
+    seconds = max(0.1, min(seconds, profiling.PROFILE_MAX_SECONDS))
+    interval = max(0.001, min(interval, 1.0))
+    
+    try:
+        result = await run_in_threadpool(profiling.cpu_profiler.run, seconds, interval, lines)
+    except profiling.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    return PlainTextResponse(
+        profiling.collapsed(result["stacks"]),
+        headers={"X-Profile-Samples": str(result["samples"]), "X-Profile-Seconds": str(result["seconds"])}
+    )
+
+# 内存分析状态和已保存的快照（管理接口）
+@app.get("/api/admin/profile/memory")
+async def get_memory_profile(username: str = Depends(verify_docs_credentials)):
+    return {
+        "status": "success",
+        "data": {
+            **profiling.memory_profiler.traced_memory(),
+            "snapshots": profiling.memory_profiler.list()
+        }
+    }
+
+# 保存内存快照，返回分配最多的位置以及相对上一个快照的增长（管理接口）
+@app.post("/api/admin/profile/memory/snapshot")
+async def take_memory_snapshot(limit: int = 30, username: str = Depends(verify_docs_credentials)):
+    limit = max(1, min(limit, 200))
+    memory = profiling.memory_profiler
+    previous = memory.list()
+    
+    snapshot_id = await run_in_threadpool(memory.take_snapshot)
+    top = await run_in_threadpool(memory.top, snapshot_id, "lineno", limit)
+    diff = None
+    if previous:
+        diff = await run_in_threadpool(memory.diff, previous[-1]["id"], snapshot_id, "lineno", limit)
+    
+    return {
+        "status": "success",
+        "data": {
+            "id": snapshot_id,
+            "previousId": previous[-1]["id"] if previous else None,
+            "memory": memory.traced_memory(),
+            "top": top,
+            "diff": diff
+        }
+    }
+
+# 比较两个内存快照（管理接口）
+@app.get("/api/admin/profile/memory/diff")
+async def diff_memory_snapshots(
+    base: int,
+    target: int,
+    group_by: str = "lineno",
+    limit: int = 30,
+    username: str = Depends(verify_docs_credentials)
+):
+    if group_by not in ("lineno", "filename", "traceback"):
+        raise HTTPException(status_code=400, detail="group_by must be one of: lineno, filename, traceback")
+    limit = max(1, min(limit, 200))
+    
+    diff = await run_in_threadpool(profiling.memory_profiler.diff, base, target, group_by, limit)
+    if diff is None:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    
+    return {
+        "status": "success",
+        "data": diff
+    }
+
+# 停止内存分析并清除快照（管理接口）
+@app.delete("/api/admin/profile/memory")
+async def stop_memory_profile(username: str = Depends(verify_docs_credentials)):
+    profiling.memory_profiler.stop()
+    return {
+        "status": "success",
+        "message": "Memory profiling stopped"
+    }
+
+# 流式导出注册信息、成员和提交记录（管理接口）
+@app.get("/api/admin/export")
+async def export_data(
+    format: str = "csv",
+    gzip: bool = False,
+    include_unverified: bool = False,
+    username: str = Depends(verify_docs_credentials)
+):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format, choose one of: {', '.join(EXPORT_FORMATS)}")
+    
+    filename = f"export.{format}.gz" if gzip else f"export.{format}"
+    media_type = "application/gzip" if gzip else EXPORT_FORMATS[format]
+    return StreamingResponse(
+        iter_export(format, gzip, include_unverified),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+# 从 CSV/JSONL 文件批量导入团队，请求体为文件内容（管理接口）
+@app.post("/api/admin/import")
+async def import_teams(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    format: str = "csv",
+    verified: bool = False,
+    send_emails: bool = False,
+    dry_run: bool = False,
+    username: str = Depends(verify_docs_credentials)
+):
+    if format not in bulk_import.IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format, choose one of: {', '.join(bulk_import.IMPORT_FORMATS)}")
+    
+    # 请求体先写入临时文件，再在线程池中逐行解析
+    # （Python 3.10 的 SpooledTemporaryFile 不能被 TextIOWrapper 包装，使用普通临时文件）
+    with tempfile.TemporaryFile() as body:
+        async for chunk in request.stream():
+            body.write(chunk)
+        body.seek(0)
+        report, codes = await run_in_threadpool(
+            bulk_import.import_file, body, format, verified=verified, dry_run=dry_run
+        )
+    
+    if report.imported:
+        change_notifier.notify()
+    
+    # 验证码邮件在响应返回后发送
+    if send_emails and codes:
+        background_tasks.add_task(bulk_import.send_import_emails, codes)
+    
+    return {
+        "status": "success",
+        "data": {
+            **report.to_dict(),
+            "emailsQueued": len(codes) if send_emails else 0
+        }
+    }
+
+# 创建数据库快照（管理接口）
+@app.post("/api/admin/snapshots")
+async def create_snapshot(keep: Optional[int] = None, username: str = Depends(verify_docs_credentials)):
+    try:
+        info = await run_in_threadpool(snapshots.create_snapshot, keep=keep)
+    except snapshots.SnapshotError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    return {
+        "status": "success",
+        "data": info
+    }
+
+# 列出数据库快照（管理接口）
+@app.get("/api/admin/snapshots")
+async def list_snapshots(username: str = Depends(verify_docs_credentials)):
+    items = snapshots.list_snapshots()
+    return {
+        "status": "success",
+        "total": len(items),
+        "data": items
+    }
+
+# 下载数据库快照（管理接口）
+@app.get("/api/admin/snapshots/{name}")
+async def download_snapshot(name: str, username: str = Depends(verify_docs_credentials)):
+    path = snapshots.snapshot_path(name)
+    if not path:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    
+    return FileResponse(path, filename=name, media_type="application/vnd.sqlite3")
@@ -0,0 +1,190 @@
+"""
+线上性能分析
+
+CPU：采样分析器在后台线程中按固定间隔读取所有线程的调用栈（sys._current_frames），
+不需要重启服务，也不给被分析的代码加钩子，开销只与采样频率有关。
+结果为折叠栈格式（每行 "线程;外层函数;...;内层函数 次数"），可直接交给 flamegraph.pl 或 speedscope 生成火焰图。
+
+内存：使用 tracemalloc 记录分配位置，保存快照并比较两个快照之间的差异，
+用于查找全量列表接口等位置的分配热点。tracemalloc 开启后所有分配都会变慢，用完请关闭。
+"""
+import itertools
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import List, Optional
+
+# CPU 采样最长时间（秒）
+PROFILE_MAX_SECONDS = 60
+
+# 默认采样间隔（秒）
+PROFILE_INTERVAL = 0.005
+
+# 调用栈最多保留的层数
+PROFILE_MAX_DEPTH = 128
+
+# 保留的内存快照数量
+MEMORY_SNAPSHOTS_KEEP = 5
+
+# tracemalloc 默认记录的调用栈层数
+MEMORY_FRAMES = 10
+
+# 分析器自身的分配不计入快照
+_MEMORY_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+class ProfilerBusy(Exception):
+    """已有分析正在进行"""
+
+
+def _frame_label(frame, lines: bool) -> str:
+    code = frame.f_code
+    # co_qualname 从 Python 3.11 开始才有
+    label = f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+    return f"{label}:{frame.f_lineno}" if lines else label
+
+
+class SamplingProfiler:
+    """采样 CPU 分析器，同一时间只运行一次"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def run(self, seconds: float, interval: float = PROFILE_INTERVAL, lines: bool = False) -> dict:
+        """
+        在当前线程中采样 seconds 秒（阻塞，应在线程池中调用）
+
+        Args:
+            seconds: 采样时长
+            interval: 采样间隔
+            lines: 栈帧是否带行号
+
+        Returns:
+            dict: stacks（折叠栈 -> 次数）、samples（采样轮数）、seconds（实际时长）
+
+        Raises:
+            ProfilerBusy: 已有分析正在进行
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("Another CPU profile is in progress")
+
+        try:
+            me = threading.get_ident()
+            stacks = Counter()
+            samples = 0
+            start = time.perf_counter()
+            deadline = start + seconds
+            while time.perf_counter() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    labels = []
+                    while frame is not None and len(labels) < PROFILE_MAX_DEPTH:
+                        labels.append(_frame_label(frame, lines))
+                        frame = frame.f_back
+                    labels.append(names.get(ident, f"thread-{ident}").replace(" ", "_"))
+                    stacks[";".join(reversed(labels))] += 1
+                samples += 1
+                time.sleep(interval)
+            return {"stacks": stacks, "samples": samples, "seconds": round(time.perf_counter() - start, 3)}
+        finally:
+            self._lock.release()
+
+
+def collapsed(stacks: Counter) -> str:
+    """折叠栈文本，按次数从多到少排列"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class MemoryProfiler:
+    """tracemalloc 快照管理"""
+
+    def __init__(self, keep: int = MEMORY_SNAPSHOTS_KEEP):
+        self.keep = keep
+        self._ids = itertools.count(1)
+        self._snapshots: "OrderedDict[int, tuple]" = OrderedDict()  # {id: (时间, 快照)}
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = MEMORY_FRAMES) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def stop(self) -> None:
+        with self._lock:
+            self._snapshots.clear()
+        tracemalloc.stop()
+
+    def take_snapshot(self) -> int:
+        """保存一个快照（未开启时自动开启，此前的分配不会被记录），返回快照ID"""
+        self.start()
+        snapshot = tracemalloc.take_snapshot().filter_traces(_MEMORY_FILTERS)
+        with self._lock:
+            snapshot_id = next(self._ids)
+            self._snapshots[snapshot_id] = (datetime.utcnow(), snapshot)
+            while len(self._snapshots) > self.keep:
+                self._snapshots.popitem(last=False)
+        return snapshot_id
+
+    def get(self, snapshot_id: int):
+        with self._lock:
+            entry = self._snapshots.get(snapshot_id)
+        return entry[1] if entry else None
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            items = list(self._snapshots.items())
+        return [
+            {"id": snapshot_id, "takenAt": taken_at.isoformat(), "traces": len(snapshot.traces)}
+            for snapshot_id, (taken_at, snapshot) in items
+        ]
+
+    @staticmethod
+    def _location(stat) -> str:
+        frame = stat.traceback[0]
+        return f"{frame.filename}:{frame.lineno}"
+
+    def top(self, snapshot_id: int, group_by: str = "lineno", limit: int = 30) -> Optional[List[dict]]:
+        """某个快照中分配最多的位置"""
+        snapshot = self.get(snapshot_id)
+        if snapshot is None:
+            return None
+        return [
+            {"location": self._location(stat), "size": stat.size, "count": stat.count,
+             "traceback": stat.traceback.format() if group_by == "traceback" else None}
+            for stat in snapshot.statistics(group_by)[:limit]
+        ]
+
+    def diff(self, base_id: int, target_id: int, group_by: str = "lineno", limit: int = 30) -> Optional[List[dict]]:
+        """两个快照之间增长最多的位置"""
+        base, target = self.get(base_id), self.get(target_id)
+        if base is None or target is None:
+            return None
+        return [
+            {"location": self._location(stat), "sizeDiff": stat.size_diff, "size": stat.size,
+             "countDiff": stat.count_diff, "count": stat.count,
+             "traceback": stat.traceback.format() if group_by == "traceback" else None}
+            for stat in target.compare_to(base, group_by)[:limit]
+        ]
+
+    def traced_memory(self) -> dict:
+        current, peak = tracemalloc.get_traced_memory()
+        return {"tracing": self.tracing, "current": current, "peak": peak}
+
+
+# 全局分析器
+cpu_profiler = SamplingProfiler()
+memory_profiler = MemoryProfiler()
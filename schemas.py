@@ -0,0 +1,21 @@
+"""
+注册数据模型（Pydantic），由注册接口和批量导入共用
+"""
+from typing import List
+
+from pydantic import BaseModel, EmailStr
+
+
+class Member(BaseModel):
+    name: str
+    isLeader: bool = False
+
+
+class RegistrationData(BaseModel):
+    teamName: str
+    organization: str
+    orgAddress: str = ""
+    email: EmailStr
+    username: str
+    password: str
+    members: List[Member]
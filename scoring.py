@@ -0,0 +1,461 @@
+"""
+提交结果自动评分
+
+评分任务保存在 scoring_jobs 表中（持久化任务队列），上传完成的提交会自动入队。
+评分进程从队列中领取任务，交给 ProcessPoolExecutor 的工作进程计算指标，再把结果写回数据库。
+
+预测文件格式（.npz）:
+    cls         (N,)      每个病例的分类结果（整数类别）
+    long_mask   (N, H, W) 纵切面分割结果，0=背景 1=血管 2=斑块
+    trans_mask  (N, H, W) 横切面分割结果
+金标准目录中保存同名的 .npy 文件（cls.npy、long_mask.npy、trans_mask.npy），以内存映射方式读取。
+
+评分规则见 front_website/assessment.html：
+    S_cls = 各类别F1的平均值
+    S_seg = 1/2 * Σ_view (0.4 * S_vessel + 0.6 * S_plaque)，其中 S = (DSC + NSD) / 2
+    score = 0.4 * S_cls + 0.4 * S_seg（处理时间得分需要推理耗时，另行计算）
+
+命令行用法:
+    python scoring.py --workers 4 --ground-truth ./ground_truth
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional
+
+import numpy as np
+
+from database import SessionLocal, ScoringJob, SubmissionUpload
+import uploads
+
+# 金标准目录
+GROUND_TRUTH_DIR = "./ground_truth"
+
+# 每个任务最长运行时间（秒），超时后重试
+JOB_TIMEOUT = 600
+
+# 最多尝试次数
+MAX_ATTEMPTS = 3
+
+# 轮询任务队列的间隔（秒）
+POLL_INTERVAL = 1.0
+
+# 每次处理的病例数，处理完一批上报一次进度
+CASES_PER_CHUNK = 32
+
+# NSD 的边界容差（像素）
+NSD_TOLERANCE = 2
+
+VIEWS = ("long", "trans")
+VESSEL_LABEL = 1
+PLAQUE_LABEL = 2
+
+# 分类标签的最大值（mean_f1 的混淆矩阵大小与最大标签的平方成正比）
+MAX_CLASS_LABEL = 255
+
+
+class PredictionError(ValueError):
+    """预测文件内容不合法，重试也无法成功"""
+
+
+def enqueue_scoring(db, submission_id: int) -> ScoringJob:
+    """
+    为提交创建评分任务（不提交事务，由调用方统一提交）
+
+    Args:
+        db: 数据库会话
+        submission_id: 提交记录ID
+    """
+    job = ScoringJob(submission_id=submission_id, status="queued")
+    db.add(job)
+    return job
+
+
+# ---------------------------------------------------------------------------
+# 指标计算（对整批病例向量化计算）
+# ---------------------------------------------------------------------------
+
+def _shift(mask: np.ndarray, dy: int, dx: int) -> np.ndarray:
+    """把 (N, H, W) 的布尔数组平移 (dy, dx)，空出的位置补 False"""
+    height, width = mask.shape[-2:]
+    out = np.zeros_like(mask)
+    out[..., max(dy, 0):height + min(dy, 0), max(dx, 0):width + min(dx, 0)] = \
+        mask[..., max(-dy, 0):height + min(-dy, 0), max(-dx, 0):width + min(-dx, 0)]
+    return out
+
+
+def surface(mask: np.ndarray) -> np.ndarray:
+    """提取边界像素：属于目标但4邻域中存在背景的像素"""
+    eroded = mask.copy()
+    for dy, dx in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+        eroded &= _shift(mask, dy, dx)
+    return mask & ~eroded
+
+
+def dilate(mask: np.ndarray, radius: int) -> np.ndarray:
+    """用半径为 radius 的圆形结构元素膨胀"""
+    out = mask.copy()
+    for dy in range(-radius, radius + 1):
+        for dx in range(-radius, radius + 1):
+            if (dy or dx) and dy * dy + dx * dx <= radius * radius:
+                out |= _shift(mask, dy, dx)
+    return out
+
+
+def dice(pred: np.ndarray, gt: np.ndarray) -> np.ndarray:
+    """逐病例计算 Dice 系数，两者都为空时记为1"""
+    intersection = np.count_nonzero(pred & gt, axis=(1, 2))
+    total = np.count_nonzero(pred, axis=(1, 2)) + np.count_nonzero(gt, axis=(1, 2))
+    return np.where(total == 0, 1.0, 2.0 * intersection / np.maximum(total, 1))
+
+
+def normalized_surface_dice(pred: np.ndarray, gt: np.ndarray, tolerance: int = NSD_TOLERANCE) -> np.ndarray:
+    """逐病例计算 Normalized Surface Dice，两者都为空时记为1"""
+    pred_surface = surface(pred)
+    gt_surface = surface(gt)
+    overlap = (np.count_nonzero(pred_surface & dilate(gt_surface, tolerance), axis=(1, 2))
+               + np.count_nonzero(gt_surface & dilate(pred_surface, tolerance), axis=(1, 2)))
+    total = np.count_nonzero(pred_surface, axis=(1, 2)) + np.count_nonzero(gt_surface, axis=(1, 2))
+    return np.where(total == 0, 1.0, overlap / np.maximum(total, 1))
+
+
+def mean_f1(pred: np.ndarray, gt: np.ndarray) -> float:
+    """各类别 F1 的平均值（类别为金标准与预测中出现的所有类别）"""
+    pred = np.asarray(pred, dtype=np.int64)
+    gt = np.asarray(gt, dtype=np.int64)
+    if pred.size == 0:
+        return 0.0
+    classes = np.union1d(pred, gt)
+    k = int(classes.max()) + 1
+    confusion = np.bincount(gt * k + pred, minlength=k * k).reshape(k, k)
+    tp = np.diag(confusion)
+    fp = confusion.sum(axis=0) - tp
+    fn = confusion.sum(axis=1) - tp
+    denominator = 2 * tp + fp + fn
+    f1 = np.where(denominator == 0, 0.0, 2 * tp / np.maximum(denominator, 1))
+    return float(f1[classes].mean())
+
+
+# ---------------------------------------------------------------------------
+# 工作进程
+# ---------------------------------------------------------------------------
+
+# 工作进程中的进度队列，由 ProcessPoolExecutor 的 initializer 设置
+_progress_queue = None
+
+
+def _init_worker(progress_queue) -> None:
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def _report_progress(job_id: Optional[int], fraction: float) -> None:
+    if _progress_queue is not None and job_id is not None:
+        try:
+            _progress_queue.put_nowait((job_id, fraction))
+        except queue.Full:
+            pass
+
+
+def load_ground_truth(ground_truth_dir: str) -> Dict[str, np.ndarray]:
+    """以内存映射方式加载金标准，只有实际访问到的病例才会读入内存"""
+    return {
+        name: np.load(os.path.join(ground_truth_dir, f"{name}.npy"), mmap_mode="r")
+        for name in ("cls", "long_mask", "trans_mask")
+    }
+
+
+def score_arrays(prediction, ground_truth, job_id: Optional[int] = None) -> dict:
+    """
+    计算一份预测结果的各项指标
+
+    Args:
+        prediction: 含 cls / long_mask / trans_mask 数组的字典
+        ground_truth: 同样结构的金标准
+        job_id: 评分任务ID，用于上报进度
+
+    Returns:
+        dict: cls_score、seg_score、score 以及详细指标 metrics
+    """
+    for name in ("cls", "long_mask", "trans_mask"):
+        if name not in prediction:
+            raise PredictionError(f"Prediction is missing array '{name}'")
+        if prediction[name].shape != ground_truth[name].shape:
+            raise PredictionError(
+                f"Array '{name}' has shape {prediction[name].shape}, expected {ground_truth[name].shape}"
+            )
+
+    # 分类标签必须是非负整数，否则 mean_f1 中的 np.bincount 会报错，重试也无法成功
+    cls = np.asarray(prediction["cls"])
+    if not (np.issubdtype(cls.dtype, np.integer) or np.issubdtype(cls.dtype, np.bool_)):
+        if not np.issubdtype(cls.dtype, np.floating) or not np.all(np.mod(cls, 1) == 0):
+            raise PredictionError("Array 'cls' must contain integer class labels")
+    if cls.size and (cls.min() < 0 or cls.max() > MAX_CLASS_LABEL):
+        raise PredictionError(f"Array 'cls' must contain class labels between 0 and {MAX_CLASS_LABEL}")
+
+    cases = ground_truth["cls"].shape[0]
+    per_case = {
+        f"{view}_{structure}_{metric}": np.empty(cases)
+        for view in VIEWS
+        for structure in ("vessel", "plaque")
+        for metric in ("dsc", "nsd")
+    }
+
+    pred_masks = {view: prediction[f"{view}_mask"] for view in VIEWS}
+    for start in range(0, cases, CASES_PER_CHUNK):
+        end = min(start + CASES_PER_CHUNK, cases)
+        for view in VIEWS:
+            pred_chunk = np.asarray(pred_masks[view][start:end])
+            gt_chunk = np.asarray(ground_truth[f"{view}_mask"][start:end])
+            for structure, label in (("vessel", VESSEL_LABEL), ("plaque", PLAQUE_LABEL)):
+                pred_label = pred_chunk == label
+                gt_label = gt_chunk == label
+                per_case[f"{view}_{structure}_dsc"][start:end] = dice(pred_label, gt_label)
+                per_case[f"{view}_{structure}_nsd"][start:end] = normalized_surface_dice(pred_label, gt_label)
+        _report_progress(job_id, end / cases)
+
+    metrics = {key: float(values.mean()) if cases else 0.0 for key, values in per_case.items()}
+    metrics["f1"] = mean_f1(prediction["cls"], ground_truth["cls"])
+
+    seg = 0.0
+    for view in VIEWS:
+        vessel = (metrics[f"{view}_vessel_dsc"] + metrics[f"{view}_vessel_nsd"]) / 2
+        plaque = (metrics[f"{view}_plaque_dsc"] + metrics[f"{view}_plaque_nsd"]) / 2
+        seg += (0.4 * vessel + 0.6 * plaque) / len(VIEWS)
+
+    cls_score = metrics["f1"] * 100
+    seg_score = seg * 100
+    return {
+        "cls_score": cls_score,
+        "seg_score": seg_score,
+        "score": 0.4 * cls_score + 0.4 * seg_score,
+        "metrics": metrics,
+    }
+
+
+def score_file(job_id: Optional[int], prediction_path: str, ground_truth_dir: str) -> dict:
+    """工作进程入口：读取预测文件和金标准并计算得分"""
+    ground_truth = load_ground_truth(ground_truth_dir)
+    try:
+        prediction = np.load(prediction_path, allow_pickle=False)
+    except (OSError, ValueError) as e:
+        raise PredictionError(f"Cannot read prediction file: {e}")
+    if not hasattr(prediction, "files"):
+        raise PredictionError("Prediction must be an .npz archive")
+    with prediction:
+        # NpzFile 每次按键访问都会重新解压，先读出需要的数组
+        arrays = {name: prediction[name] for name in ground_truth if name in prediction.files}
+    return score_arrays(arrays, ground_truth, job_id)
+
+
+# ---------------------------------------------------------------------------
+# 任务调度
+# ---------------------------------------------------------------------------
+
+class ScoringEngine:
+    """
+    从 scoring_jobs 表领取任务并分发给工作进程池
+
+    同一时间只应运行一个评分进程；启动时会把上次异常退出遗留的 running 任务重新入队。
+    """
+
+    def __init__(self, workers: int = 2, ground_truth_dir: str = GROUND_TRUTH_DIR,
+                 timeout: float = JOB_TIMEOUT, max_attempts: int = MAX_ATTEMPTS,
+                 poll_interval: float = POLL_INTERVAL):
+        self.workers = workers
+        self.ground_truth_dir = ground_truth_dir
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.progress_queue = multiprocessing.Queue()
+        self.pool = self._create_pool()
+        self.running = {}  # {job_id: (future, deadline)}
+
+    def _create_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self.progress_queue,)
+        )
+
+    def _restart_pool(self) -> None:
+        """任务超时后重建进程池（超时的工作进程无法单独取消）"""
+        # ProcessPoolExecutor 没有公开的终止接口，直接结束卡住的工作进程
+        for process in list(getattr(self.pool, "_processes", {}).values()):
+            process.terminate()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.pool = self._create_pool()
+
+    def recover(self) -> None:
+        """把遗留的 running 任务重新入队"""
+        db = SessionLocal()
+        try:
+            db.query(ScoringJob).filter(ScoringJob.status == "running").update(
+                {"status": "queued", "progress": 0.0}, synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _prediction_path(self, db, job: ScoringJob) -> Optional[str]:
+        upload = db.query(SubmissionUpload).filter(
+            SubmissionUpload.submission_id == job.submission_id,
+            SubmissionUpload.completed_at != None
+        ).first()
+        return uploads.stored_path(upload.sha256) if upload else None
+
+    def _finish(self, job: ScoringJob, status: str, error: Optional[str] = None) -> None:
+        job.status = status
+        job.error = error
+        job.finished_at = datetime.utcnow()
+
+    def _fail_or_retry(self, job: ScoringJob, error: str, retry: bool = True) -> None:
+        if retry and job.attempts < self.max_attempts:
+            job.status = "queued"
+            job.progress = 0.0
+            job.error = error
+        else:
+            self._finish(job, "failed", error)
+
+    def _claim(self, db) -> None:
+        """领取排队中的任务，直到占满所有工作进程"""
+        free = self.workers - len(self.running)
+        if free <= 0:
+            return
+        candidates = db.query(ScoringJob.id).filter(
+            ScoringJob.status == "queued"
+        ).order_by(ScoringJob.id).limit(free).all()
+        for (job_id,) in candidates:
+            claimed = db.query(ScoringJob).filter(
+                ScoringJob.id == job_id,
+                ScoringJob.status == "queued"
+            ).update({
+                "status": "running",
+                "attempts": ScoringJob.attempts + 1,
+                "progress": 0.0,
+                "started_at": datetime.utcnow()
+            }, synchronize_session=False)
+            db.commit()
+            if not claimed:
+                continue
+
+            job = db.query(ScoringJob).filter(ScoringJob.id == job_id).first()
+            path = self._prediction_path(db, job)
+            if not path:
+                self._finish(job, "failed", "Submission has no uploaded prediction file")
+                db.commit()
+                continue
+
+            future = self.pool.submit(score_file, job_id, path, self.ground_truth_dir)
+            self.running[job_id] = (future, time.monotonic() + self.timeout)
+
+    def _drain_progress(self, db) -> None:
+        latest = {}
+        while True:
+            try:
+                job_id, fraction = self.progress_queue.get_nowait()
+            except queue.Empty:
+                break
+            latest[job_id] = fraction
+        for job_id, fraction in latest.items():
+            if job_id in self.running:
+                db.query(ScoringJob).filter(ScoringJob.id == job_id).update(
+                    {"progress": fraction}, synchronize_session=False
+                )
+        if latest:
+            db.commit()
+
+    def _collect(self, db) -> None:
+        """写回已完成任务的结果，处理超时"""
+        now = time.monotonic()
+        timed_out = False
+        for job_id, (future, deadline) in list(self.running.items()):
+            if not future.done() and now < deadline:
+                continue
+            del self.running[job_id]
+            job = db.query(ScoringJob).filter(ScoringJob.id == job_id).first()
+            if not future.done():
+                timed_out = True
+                self._fail_or_retry(job, f"Timed out after {self.timeout}s")
+                continue
+            try:
+                result = future.result()
+            except PredictionError as e:
+                self._finish(job, "failed", str(e))
+            except Exception as e:
+                self._fail_or_retry(job, f"{type(e).__name__}: {e}")
+            else:
+                job.cls_score = result["cls_score"]
+                job.seg_score = result["seg_score"]
+                job.score = result["score"]
+                job.metrics = json.dumps(result["metrics"])
+                job.progress = 1.0
+                self._finish(job, "done")
+        db.commit()
+
+        if timed_out:
+            # 重建进程池会中断其余正在运行的任务，把它们放回队列且不计入尝试次数
+            self._restart_pool()
+            for job_id in list(self.running):
+                db.query(ScoringJob).filter(ScoringJob.id == job_id).update({
+                    "status": "queued",
+                    "progress": 0.0,
+                    "attempts": ScoringJob.attempts - 1
+                }, synchronize_session=False)
+            self.running.clear()
+            db.commit()
+
+    def run_once(self) -> None:
+        """执行一轮调度：更新进度、收集结果、领取新任务"""
+        db = SessionLocal()
+        try:
+            self._drain_progress(db)
+            self._collect(db)
+            self._claim(db)
+        finally:
+            db.close()
+
+    def run_forever(self) -> None:
+        self.recover()
+        try:
+            while True:
+                self.run_once()
+                time.sleep(self.poll_interval)
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="运行评分工作进程")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="工作进程数")
+    parser.add_argument("--ground-truth", default=GROUND_TRUTH_DIR, help="金标准目录")
+    parser.add_argument("--timeout", type=float, default=JOB_TIMEOUT, help="单个任务超时时间（秒）")
+    parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS, help="最多尝试次数")
+    args = parser.parse_args()
+
+    from database import init_db
+    init_db()
+
+    engine = ScoringEngine(
+        workers=args.workers,
+        ground_truth_dir=args.ground_truth,
+        timeout=args.timeout,
+        max_attempts=args.max_attempts
+    )
+    print(f"评分服务已启动，工作进程数: {args.workers}")
+    try:
+        engine.run_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
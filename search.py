@@ -0,0 +1,232 @@
+"""
+团队全文搜索（SQLite FTS5）
+
+每个团队在 FTS5 表 team_search 中对应一行（rowid 为团队ID），包含用户名、队名、单位、邮箱、
+全部成员姓名和全部提交标题。team_registrations、team_members、submissions 上的触发器在同一事务中
+更新对应团队的索引行，任何写入路径（包括直接改数据库）都会保持同步。
+
+查询中的每个词都按前缀匹配（"zhang" 可以匹配 "zhangsan"），多个词之间为 AND，
+结果按 bm25 排序，用户名、队名的权重高于成员和提交标题。
+
+命令行用法:
+    python search.py --rebuild          # 根据现有数据重建索引
+    python search.py "tsinghua zhang"   # 在命令行中搜索
+"""
+import argparse
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Boolean, DateTime, text
+
+from database import engine, SessionLocal
+
+# 每页最多返回的条数
+SEARCH_MAX_LIMIT = 100
+
+# 查询最多包含的词数
+SEARCH_MAX_TERMS = 8
+
+# bm25 各列权重，顺序与 team_search 的列一致
+SEARCH_WEIGHTS = (10.0, 8.0, 4.0, 2.0, 5.0, 1.0)
+
+_COLUMNS = "username, team_name, organization, email, members, submissions"
+
+# 团队的一行索引数据
+_TEAM_ROW = '''
+    SELECT t.id, t.username, t."teamName", t.organization, t.email,
+           coalesce((SELECT group_concat(m.name, char(10)) FROM team_members m WHERE m.team_id = t.id), ''),
+           coalesce((SELECT group_concat(s.title, char(10)) FROM submissions s WHERE s.username = t.username), '')
+    FROM team_registrations t
+'''
+
+_CREATE_TABLE = f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS team_search USING fts5(
+        {_COLUMNS},
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+'''
+
+
+def _refresh_team(team_id_expr: str) -> str:
+    """触发器中重建某个团队索引行的语句"""
+    return f'''
+        DELETE FROM team_search WHERE rowid = {team_id_expr};
+        INSERT INTO team_search(rowid, {_COLUMNS}) {_TEAM_ROW} WHERE t.id = {team_id_expr};
+    '''
+
+
+_TEAM_ID_BY_USERNAME = "(SELECT id FROM team_registrations WHERE username = {})"
+
+_TRIGGERS = {
+    "team_search_team_insert": f'''
+        CREATE TRIGGER IF NOT EXISTS team_search_team_insert AFTER INSERT ON team_registrations BEGIN
+            {_refresh_team("NEW.id")}
+        END
+    ''',
+    "team_search_team_update": f'''
+        CREATE TRIGGER IF NOT EXISTS team_search_team_update
+        AFTER UPDATE OF username, "teamName", organization, email ON team_registrations BEGIN
+            {_refresh_team("NEW.id")}
+        END
+    ''',
+    "team_search_team_delete": '''
+        CREATE TRIGGER IF NOT EXISTS team_search_team_delete AFTER DELETE ON team_registrations BEGIN
+            DELETE FROM team_search WHERE rowid = OLD.id;
+        END
+    ''',
+    "team_search_member_insert": f'''
+        CREATE TRIGGER IF NOT EXISTS team_search_member_insert AFTER INSERT ON team_members BEGIN
+            {_refresh_team("NEW.team_id")}
+        END
+    ''',
+    "team_search_member_update": f'''
+        CREATE TRIGGER IF NOT EXISTS team_search_member_update AFTER UPDATE OF name ON team_members BEGIN
+            {_refresh_team("NEW.team_id")}
+        END
+    ''',
+    "team_search_member_delete": f'''
+        CREATE TRIGGER IF NOT EXISTS team_search_member_delete AFTER DELETE ON team_members BEGIN
+            {_refresh_team("OLD.team_id")}
+        END
+    ''',
+    "team_search_submission_insert": f'''
+        CREATE TRIGGER IF NOT EXISTS team_search_submission_insert AFTER INSERT ON submissions BEGIN
+            {_refresh_team(_TEAM_ID_BY_USERNAME.format("NEW.username"))}
+        END
+    ''',
+    "team_search_submission_update": f'''
+        CREATE TRIGGER IF NOT EXISTS team_search_submission_update AFTER UPDATE OF title ON submissions BEGIN
+            {_refresh_team(_TEAM_ID_BY_USERNAME.format("NEW.username"))}
+        END
+    ''',
+    "team_search_submission_delete": f'''
+        CREATE TRIGGER IF NOT EXISTS team_search_submission_delete AFTER DELETE ON submissions BEGIN
+            {_refresh_team(_TEAM_ID_BY_USERNAME.format("OLD.username"))}
+        END
+    ''',
+}
+
+
+def ensure_search_index(bind=engine) -> bool:
+    """
+    创建 FTS5 表和触发器（已存在时跳过），新建表时根据现有数据填充
+
+    Returns:
+        bool: 是否新建了索引
+    """
+    with bind.begin() as conn:
+        # pysqlite 不会在 SELECT 和 DDL 之前开始事务，先取得写锁再检查，
+        # 多个 worker 同时在新数据库上启动时只有第一个会填充索引，其余的看到表已存在
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        exists = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'team_search'"
+        )).first() is not None
+        # 触发器按团队查找成员，旧数据库中 team_members.team_id 没有索引
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_team_members_team_id ON team_members (team_id)"))
+        conn.execute(text(_CREATE_TABLE))
+        for statement in _TRIGGERS.values():
+            conn.exec_driver_sql(statement)
+        if not exists:
+            conn.execute(text(f"INSERT INTO team_search(rowid, {_COLUMNS}) {_TEAM_ROW}"))
+    return not exists
+
+
+def disable_search_triggers(bind=engine) -> None:
+    """删除触发器（批量导入大量数据前使用，导入后调用 rebuild_search_index）"""
+    with bind.begin() as conn:
+        for name in _TRIGGERS:
+            conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def rebuild_search_index(bind=engine) -> int:
+    """清空并重建索引，返回索引的团队数"""
+    with bind.begin() as conn:
+        conn.execute(text(_CREATE_TABLE))
+        conn.execute(text("DELETE FROM team_search"))
+        conn.execute(text(f"INSERT INTO team_search(rowid, {_COLUMNS}) {_TEAM_ROW}"))
+        conn.execute(text("INSERT INTO team_search(team_search) VALUES ('optimize')"))
+        for statement in _TRIGGERS.values():
+            conn.exec_driver_sql(statement)
+        return conn.execute(text("SELECT count(*) FROM team_search")).scalar()
+
+
+def build_match_query(q: str) -> Optional[str]:
+    """
+    把用户输入转换为 FTS5 查询：每个词作为带引号的前缀查询，词之间为 AND
+
+    Returns:
+        str: FTS5 MATCH 表达式；没有可搜索的词时返回 None
+    """
+    terms = [term for term in re.split(r"[\s\"*^:()+\-]+", q) if re.search(r"\w", term)][:SEARCH_MAX_TERMS]
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def search_teams(db, q: str, limit: int = 20, offset: int = 0) -> Tuple[int, List[dict]]:
+    """
+    搜索团队
+
+    Returns:
+        (int, list): 匹配总数，当前页结果（按相关度排序）
+    """
+    match = build_match_query(q)
+    if match is None:
+        return 0, []
+
+    total = db.execute(text("SELECT count(*) FROM team_search WHERE team_search MATCH :match"), {"match": match}).scalar()
+    rows = db.execute(text(f'''
+        SELECT t.id, t.username, t."teamName", t.organization, t.email, t.is_verified, t.created_at,
+               team_search.members,
+               snippet(team_search, -1, '[', ']', '...', 8) AS snippet,
+               bm25(team_search, {", ".join(str(weight) for weight in SEARCH_WEIGHTS)}) AS relevance
+        FROM team_search
+        JOIN team_registrations t ON t.id = team_search.rowid
+        WHERE team_search MATCH :match
+        ORDER BY relevance
+        LIMIT :limit OFFSET :offset
+    ''').columns(is_verified=Boolean, created_at=DateTime), {"match": match, "limit": limit, "offset": offset}).all()
+
+    return total, [
+        {
+            "id": row.id,
+            "username": row.username,
+            "teamName": row.teamName,
+            "organization": row.organization,
+            "email": row.email,
+            "isVerified": row.is_verified,
+            "createdAt": row.created_at.isoformat(),
+            "members": row.members.split("\n") if row.members else [],
+            "match": row.snippet,
+            "score": round(-row.relevance, 6)
+        }
+        for row in rows
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="团队全文搜索索引")
+    parser.add_argument("query", nargs="?", help="搜索内容")
+    parser.add_argument("--rebuild", action="store_true", help="根据现有数据重建索引")
+    parser.add_argument("--limit", type=int, default=20, help="返回条数")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        print(f"索引已重建: {rebuild_search_index()} 个团队")
+    else:
+        ensure_search_index()
+
+    if args.query:
+        db = SessionLocal()
+        try:
+            total, results = search_teams(db, args.query, limit=args.limit)
+        finally:
+            db.close()
+        print(f"共 {total} 条结果")
+        for item in results:
+            print(f"{item['score']:8.3f}  {item['username']:<20} {item['teamName']} / {item['organization']}  {item['match']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+本地 SMTP 测试服务器
+
+接收邮件但不投递，用于在不连接真实邮件服务商的情况下测试 email_service 和测量发信性能。
+支持 SSL（对应 config.USE_SSL = True）和 STARTTLS，支持 AUTH PLAIN / LOGIN（接受任意账号），
+可以为各阶段注入延迟和失败。
+
+命令行用法:
+    python smtp_sink.py --port 2525 --starttls --latency data=0.05 --fail data=0.1
+    python smtp_sink.py --port 4650 --ssl
+
+未指定证书时使用 openssl 生成临时的自签名证书（smtplib 默认不校验证书）。
+"""
+import argparse
+import asyncio
+import base64
+import os
+import random
+import ssl
+import subprocess
+import tempfile
+import threading
+from typing import Dict, Optional, Tuple
+
+# 可注入延迟/失败的阶段
+STAGES = ("connect", "tls", "auth", "data")
+
+
+def generate_self_signed_cert(directory: Optional[str] = None) -> Tuple[str, str]:
+    """用 openssl 生成自签名证书，返回 (certfile, keyfile)"""
+    directory = directory or tempfile.mkdtemp(prefix="smtp_sink_")
+    certfile = os.path.join(directory, "cert.pem")
+    keyfile = os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=localhost", "-keyout", keyfile, "-out", certfile],
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    return certfile, keyfile
+
+
+class SMTPSink:
+    """
+    基于 asyncio 的最小 SMTP 服务器
+
+    Args:
+        host: 监听地址
+        port: 监听端口，0 表示自动分配
+        use_ssl: 连接建立时即使用 TLS（SMTPS）
+        starttls: 支持 STARTTLS 升级
+        latency: 各阶段注入的延迟（秒），如 {"data": 0.05}
+        failure_rate: 各阶段注入失败的概率，如 {"data": 0.1}；auth 失败返回535，data 失败返回451
+        certfile / keyfile: TLS 证书，不提供时自动生成
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, use_ssl: bool = False, starttls: bool = True,
+                 latency: Optional[Dict[str, float]] = None, failure_rate: Optional[Dict[str, float]] = None,
+                 certfile: Optional[str] = None, keyfile: Optional[str] = None):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.starttls = starttls
+        self.latency = latency or {}
+        self.failure_rate = failure_rate or {}
+        self.ssl_context = None
+        if use_ssl or starttls:
+            if not certfile:
+                certfile, keyfile = generate_self_signed_cert()
+            self.ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            self.ssl_context.load_cert_chain(certfile, keyfile)
+
+        self.received = 0  # 成功接收的邮件数
+        self.failed = 0  # 注入失败的次数
+        self._server = None
+        self._loop = None
+        self._thread = None
+
+    async def _delay(self, stage: str) -> None:
+        seconds = self.latency.get(stage, 0)
+        if seconds:
+            await asyncio.sleep(seconds)
+
+    def _should_fail(self, stage: str) -> bool:
+        rate = self.failure_rate.get(stage, 0)
+        if rate and random.random() < rate:
+            self.failed += 1
+            return True
+        return False
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        async def reply(line: str) -> None:
+            writer.write((line + "\r\n").encode())
+            await writer.drain()
+
+        tls_active = self.use_ssl
+        try:
+            await self._delay("connect")
+            await reply("220 localhost ESMTP sink ready")
+
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command, _, argument = line.decode("utf-8", "replace").rstrip("\r\n").partition(" ")
+                command = command.upper()
+
+                if command in ("EHLO", "HELO"):
+                    capabilities = ["localhost", "AUTH PLAIN LOGIN", "8BITMIME", "SIZE 52428800"]
+                    if self.starttls and not tls_active:
+                        capabilities.append("STARTTLS")
+                    if command == "HELO":
+                        await reply("250 localhost")
+                        continue
+                    for capability in capabilities[:-1]:
+                        writer.write(f"250-{capability}\r\n".encode())
+                    await reply(f"250 {capabilities[-1]}")
+
+                elif command == "STARTTLS" and self.starttls and not tls_active:
+                    await reply("220 Ready to start TLS")
+                    await writer.start_tls(self.ssl_context)
+                    await self._delay("tls")
+                    tls_active = True
+
+                elif command == "AUTH":
+                    mechanism, _, initial = argument.partition(" ")
+                    mechanism = mechanism.upper()
+                    if mechanism == "PLAIN":
+                        if not initial:
+                            await reply("334 ")
+                            await reader.readline()
+                    elif mechanism == "LOGIN":
+                        await reply("334 " + base64.b64encode(b"Username:").decode())
+                        await reader.readline()
+                        await reply("334 " + base64.b64encode(b"Password:").decode())
+                        await reader.readline()
+                    else:
+                        await reply("504 Unrecognized authentication type")
+                        continue
+                    await self._delay("auth")
+                    if self._should_fail("auth"):
+                        await reply("535 Authentication credentials invalid")
+                    else:
+                        await reply("235 Authentication successful")
+
+                elif command in ("MAIL", "RCPT", "RSET", "NOOP"):
+                    await reply("250 OK")
+
+                elif command == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    while True:
+                        data_line = await reader.readline()
+                        if not data_line or data_line in (b".\r\n", b".\n"):
+                            break
+                    await self._delay("data")
+                    if self._should_fail("data"):
+                        await reply("451 Temporary failure, please try again later")
+                    else:
+                        self.received += 1
+                        await reply("250 OK: queued")
+
+                elif command == "QUIT":
+                    await reply("221 Bye")
+                    break
+
+                else:
+                    await reply("502 Command not implemented")
+        except (ConnectionError, ssl.SSLError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(
+            self._handle, self.host, self.port,
+            ssl=self.ssl_context if self.use_ssl else None
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def start_in_thread(self) -> "SMTPSink":
+        """在后台线程中运行，便于在同步代码（基准测试）中使用"""
+        started = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start())
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop_thread(self) -> None:
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+
+def parse_stage_values(values) -> Dict[str, float]:
+    """解析 stage=value 形式的参数"""
+    result = {}
+    for item in values or []:
+        stage, _, value = item.partition("=")
+        if stage not in STAGES:
+            raise argparse.ArgumentTypeError(f"Unknown stage '{stage}', choose from: {', '.join(STAGES)}")
+        result[stage] = float(value)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 SMTP 测试服务器")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=2525, help="监听端口")
+    parser.add_argument("--ssl", action="store_true", help="使用 SMTPS（对应 USE_SSL = True）")
+    parser.add_argument("--starttls", action="store_true", help="支持 STARTTLS（对应 USE_SSL = False）")
+    parser.add_argument("--latency", action="append", metavar="STAGE=SECONDS", help="为某阶段注入延迟，可重复")
+    parser.add_argument("--fail", action="append", metavar="STAGE=RATE", help="为某阶段注入失败概率，可重复")
+    parser.add_argument("--certfile", help="TLS 证书")
+    parser.add_argument("--keyfile", help="TLS 私钥")
+    args = parser.parse_args()
+
+    sink = SMTPSink(
+        host=args.host, port=args.port, use_ssl=args.ssl, starttls=args.starttls,
+        latency=parse_stage_values(args.latency), failure_rate=parse_stage_values(args.fail),
+        certfile=args.certfile, keyfile=args.keyfile
+    )
+
+    async def serve():
+        await sink.start()
+        print(f"SMTP 测试服务器已启动: {sink.host}:{sink.port} (ssl={args.ssl}, starttls={args.starttls})")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print(f"已接收 {sink.received} 封邮件，注入失败 {sink.failed} 次")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+数据库在线快照
+
+使用 SQLite 的增量备份 API 每次只复制少量页面，步骤之间主动让出，
+写入请求最多只会被阻塞一个步骤的时间。备份期间源库被其他连接修改时 SQLite 会自动重新开始，
+因此得到的快照始终是某一时刻的一致副本。写入频繁导致反复重新开始时，逐步加大每一步的页数，
+最后一次尝试一步复制整个数据库（此时写入会被阻塞一次完整复制的时间）。
+
+组织者请用快照文件（而不是正在使用的 challenge_server.db）在 DB Browser for SQLite 中查看数据。
+
+命令行用法:
+    python snapshots.py                      # 创建一次快照
+    python snapshots.py --every 3600 --keep 24   # 每小时创建一次，保留最近24个
+"""
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from database import engine
+
+# 快照保存目录
+SNAPSHOT_DIR = "./snapshots"
+
+# 每一步复制的页数
+SNAPSHOT_PAGES = 64
+
+# 每一步之后暂停的时间（秒），让写入请求有机会获得锁
+SNAPSHOT_STEP_PAUSE = 0.005
+
+# 源库在备份过程中被修改会导致备份重新开始，超过该次数后加大步长重试
+SNAPSHOT_MAX_RESTARTS = 3
+
+# 每次加大步长的倍数
+SNAPSHOT_PAGES_GROWTH = 8
+
+# 最多尝试次数（最后一次一步完成）
+SNAPSHOT_ATTEMPTS = 4
+
+# 默认保留的快照数量
+SNAPSHOT_KEEP = 24
+
+SNAPSHOT_NAME_PATTERN = re.compile(r"^challenge_server-\d{8}-\d{6}(-\d+)?\.db$")
+
+# 同一时间只进行一次快照
+_snapshot_lock = threading.Lock()
+
+
+class SnapshotError(Exception):
+    """快照失败"""
+
+
+class _Restarted(Exception):
+    """备份重新开始的次数过多，需要加大步长"""
+
+
+def source_path() -> str:
+    return engine.url.database
+
+
+def list_snapshots(directory: str = SNAPSHOT_DIR) -> List[dict]:
+    """按时间倒序列出已有快照"""
+    if not os.path.isdir(directory):
+        return []
+    snapshots = []
+    for name in os.listdir(directory):
+        if SNAPSHOT_NAME_PATTERN.match(name):
+            stat = os.stat(os.path.join(directory, name))
+            snapshots.append({
+                "name": name,
+                "size": stat.st_size,
+                "createdAt": datetime.utcfromtimestamp(stat.st_mtime).isoformat()
+            })
+    return sorted(snapshots, key=lambda item: item["name"], reverse=True)
+
+
+def snapshot_path(name: str, directory: str = SNAPSHOT_DIR) -> Optional[str]:
+    """根据快照名返回路径，名称不合法或不存在时返回 None"""
+    if not SNAPSHOT_NAME_PATTERN.match(name):
+        return None
+    path = os.path.join(directory, name)
+    return path if os.path.isfile(path) else None
+
+
+def prune_snapshots(keep: int = SNAPSHOT_KEEP, directory: str = SNAPSHOT_DIR) -> List[str]:
+    """只保留最近 keep 个快照，返回被删除的快照名"""
+    removed = []
+    for item in list_snapshots(directory)[keep:]:
+        os.remove(os.path.join(directory, item["name"]))
+        removed.append(item["name"])
+    return removed
+
+
+def _backup(target: str, pages: int, pause: float) -> int:
+    """
+    执行一次备份，返回重新开始的次数
+
+    Raises:
+        _Restarted: 重新开始次数超过 SNAPSHOT_MAX_RESTARTS
+        SnapshotError: 其他错误
+    """
+    state = {"remaining": None, "restarts": 0}
+
+    def progress(status, remaining, total):
+        # 剩余页数变多说明源库被修改、备份重新开始
+        if state["remaining"] is not None and remaining > state["remaining"]:
+            state["restarts"] += 1
+            if state["restarts"] > SNAPSHOT_MAX_RESTARTS:
+                raise _Restarted()
+        state["remaining"] = remaining
+        if pause:
+            time.sleep(pause)
+
+    source = sqlite3.connect(source_path())
+    destination = sqlite3.connect(target)
+    try:
+        source.backup(destination, pages=pages, progress=progress)
+        # 源库为 WAL 模式，快照改回回滚日志模式，保持为单个文件
+        destination.execute("PRAGMA journal_mode=DELETE")
+    except _Restarted:
+        raise
+    except Exception as e:
+        raise SnapshotError(f"Snapshot failed: {e}")
+    finally:
+        source.close()
+        destination.close()
+    return state["restarts"]
+
+
+def create_snapshot(directory: str = SNAPSHOT_DIR, pages: int = SNAPSHOT_PAGES,
+                    pause: float = SNAPSHOT_STEP_PAUSE, keep: Optional[int] = None) -> dict:
+    """
+    创建一次快照
+
+    Args:
+        directory: 快照保存目录
+        pages: 每一步复制的页数
+        pause: 每一步之后暂停的秒数
+        keep: 完成后只保留最近的 keep 个快照，None 表示不清理
+
+    Returns:
+        dict: 快照名、大小、耗时、重新开始的次数
+    """
+    if not _snapshot_lock.acquire(blocking=False):
+        raise SnapshotError("Another snapshot is in progress")
+
+    try:
+        os.makedirs(directory, exist_ok=True)
+        name = f"challenge_server-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.db"
+        suffix = 1
+        while os.path.exists(os.path.join(directory, name)):
+            suffix += 1
+            name = f"challenge_server-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}-{suffix}.db"
+        target = os.path.join(directory, name)
+        partial = target + ".partial"
+
+        start = time.perf_counter()
+        restarts = 0
+        step_pages = pages
+        try:
+            for attempt in range(SNAPSHOT_ATTEMPTS):
+                if attempt == SNAPSHOT_ATTEMPTS - 1:
+                    step_pages = -1  # 一步复制全部页面
+                try:
+                    restarts += _backup(partial, step_pages, pause)
+                    break
+                except _Restarted:
+                    restarts += SNAPSHOT_MAX_RESTARTS + 1
+                    step_pages *= SNAPSHOT_PAGES_GROWTH
+        except SnapshotError:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        os.replace(partial, target)
+
+        removed = prune_snapshots(keep, directory) if keep is not None else []
+        return {
+            "name": name,
+            "size": os.path.getsize(target),
+            "seconds": round(time.perf_counter() - start, 3),
+            "restarts": restarts,
+            "pruned": removed
+        }
+    finally:
+        _snapshot_lock.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="创建数据库在线快照")
+    parser.add_argument("--dir", default=SNAPSHOT_DIR, help="快照保存目录")
+    parser.add_argument("--every", type=float, default=0, help="每隔多少秒创建一次快照，0 表示只创建一次")
+    parser.add_argument("--keep", type=int, default=SNAPSHOT_KEEP, help="保留的快照数量")
+    parser.add_argument("--pages", type=int, default=SNAPSHOT_PAGES, help="每一步复制的页数")
+    args = parser.parse_args()
+
+    while True:
+        try:
+            info = create_snapshot(args.dir, pages=args.pages, keep=args.keep)
+            print(f"快照已创建: {info['name']} ({info['size']} bytes, {info['seconds']}s, 重新开始 {info['restarts']} 次)")
+        except SnapshotError as e:
+            print(f"快照失败: {e}")
+        if not args.every:
+            break
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    main()
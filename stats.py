@@ -0,0 +1,150 @@
+"""
+组织者统计数据
+
+用 SQL 聚合计算各单位团队数、每日注册数、验证转化率和每小时提交数，结果缓存在内存中。
+注册、验证、提交时调用 mark_dirty() 标记缓存过期，下次读取时重新计算；
+即使没有写入（例如其他 worker 写入），缓存也最多保留 STATS_MAX_AGE 秒。
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import case, func
+
+from database import ReadSessionLocal, TeamRegistration, VerificationCode, Submission
+from cache import BOOT_ID
+
+# 布尔列直接 sum 会被转换回布尔值，改为计数
+_verified = func.coalesce(func.sum(case((TeamRegistration.is_verified == True, 1), else_=0)), 0)
+_codes_used = func.coalesce(func.sum(case((VerificationCode.is_used == True, 1), else_=0)), 0)
+
+# 缓存最长保留时间（秒）
+STATS_MAX_AGE = 30
+
+# 两次重新计算之间的最短间隔（秒），避免写入频繁时反复计算
+STATS_MIN_INTERVAL = 2
+
+# 每小时提交数统计最近多少小时
+SUBMISSION_HOURS = 72
+
+
+def compute_stats(db) -> dict:
+    """用聚合查询计算统计数据"""
+    teams_total, teams_verified = db.query(
+        func.count(TeamRegistration.id),
+        _verified
+    ).one()
+
+    teams_per_org = db.query(
+        TeamRegistration.organization,
+        func.count(TeamRegistration.id),
+        _verified
+    ).group_by(TeamRegistration.organization).order_by(func.count(TeamRegistration.id).desc()).all()
+
+    registration_day = func.date(TeamRegistration.created_at)
+    registrations_per_day = db.query(
+        registration_day,
+        func.count(TeamRegistration.id),
+        _verified
+    ).group_by(registration_day).order_by(registration_day).all()
+
+    codes_sent, codes_used = db.query(
+        func.count(VerificationCode.id),
+        _codes_used
+    ).one()
+
+    submission_hour = func.strftime("%Y-%m-%dT%H:00:00", Submission.created_at)
+    since = datetime.utcnow() - timedelta(hours=SUBMISSION_HOURS)
+    submissions_per_hour = db.query(
+        submission_hour,
+        func.count(Submission.id)
+    ).filter(
+        Submission.created_at >= since
+    ).group_by(submission_hour).order_by(submission_hour).all()
+
+    submissions_total, submitting_teams = db.query(
+        func.count(Submission.id),
+        func.count(func.distinct(Submission.username))
+    ).one()
+
+    return {
+        "teams": {
+            "total": teams_total,
+            "verified": teams_verified,
+            "pending": teams_total - teams_verified
+        },
+        "verification": {
+            "codesSent": codes_sent,
+            "codesUsed": codes_used,
+            "conversionRate": round(teams_verified / teams_total, 4) if teams_total else 0.0
+        },
+        "teamsPerOrganization": [
+            {"organization": organization, "teams": count, "verified": verified}
+            for organization, count, verified in teams_per_org
+        ],
+        "registrationsPerDay": [
+            {"date": day, "registrations": count, "verified": verified}
+            for day, count, verified in registrations_per_day
+        ],
+        "submissions": {
+            "total": submissions_total,
+            "teams": submitting_teams
+        },
+        "submissionsPerHour": [
+            {"hour": hour, "submissions": count}
+            for hour, count in submissions_per_hour
+        ]
+    }
+
+
+class StatsCache:
+    """统计数据缓存"""
+
+    def __init__(self, max_age: float = STATS_MAX_AGE, min_interval: float = STATS_MIN_INTERVAL):
+        self.max_age = max_age
+        self.min_interval = min_interval
+        self._value: Optional[dict] = None
+        self._computed_at = 0.0
+        self._dirty = True
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def etag(self) -> str:
+        """当前缓存结果的弱ETag，每次重新计算后变化"""
+        return f'W/"stats-{BOOT_ID}-{self._version}"'
+
+    def mark_dirty(self) -> None:
+        """有写入时调用"""
+        self._dirty = True
+
+    def is_fresh(self) -> bool:
+        """缓存结果是否仍可直接使用"""
+        age = time.monotonic() - self._computed_at
+        return self._value is not None and age < self.max_age and (not self._dirty or age < self.min_interval)
+
+    def get(self) -> dict:
+        """返回统计数据，缓存过期时重新计算（会访问数据库，应在线程池中调用）"""
+        if self.is_fresh():
+            return self._value
+
+        with self._lock:
+            # 等待锁期间可能已经被其他线程刷新
+            if not self.is_fresh():
+                self._dirty = False
+                # 在线程池中运行，使用只读连接，不能碰请求共用的主连接
+                db = ReadSessionLocal()
+                try:
+                    value = compute_stats(db)
+                finally:
+                    db.close()
+                value["generatedAt"] = datetime.utcnow().isoformat()
+                self._value = value
+                self._computed_at = time.monotonic()
+                self._version += 1
+            return self._value
+
+
+# 全局统计缓存
+stats_cache = StatsCache()
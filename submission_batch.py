@@ -0,0 +1,207 @@
+"""
+提交记录的组提交（group commit）
+
+截止前大量提交同时到达，每个请求单独 commit 时都要等一次 fsync，吞吐量受限于磁盘的 fsync 速率。
+这里把 max_delay 时间内到达的提交攒成一批（最多 max_batch_size 条），在一个事务中写入提交记录、幂等键和变更日志，
+只 commit 一次，再把分配的 id 和 created_at 分别返回给各个请求。
+
+幂等键与提交记录在同一事务中写入，表上有 (username, key) 唯一约束：同一个键的重试落到另一个 worker 时，
+插入因唯一约束失败，该批改为逐条写入，冲突的那一条返回已有的提交记录，不会重复写入。
+
+批次在事件循环线程中同步写入（与原先 submit_work 直接写库相同），不会与其他请求交错使用同一个数据库连接。
+max_delay 为 0 时不攒批，每个提交立即单独写入。
+"""
+import asyncio
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, Submission, SubmissionIdempotencyKey
+from changes import record_change, submission_state
+
+# 每批最多的提交数
+SUBMISSION_BATCH_SIZE = 64
+
+# 第一条提交到达后最多等待的时间（秒）
+SUBMISSION_BATCH_DELAY = 0.005
+
+# 幂等键的保留时间
+IDEMPOTENCY_KEY_RETENTION = timedelta(hours=24)
+
+
+class IdempotencyKeyConflict(Exception):
+    """幂等键已被用于内容不同的提交"""
+
+
+def find_idempotency_key(db: Session, username: str, key: str) -> Optional[Tuple[str, dict]]:
+    """
+    查询幂等键对应的提交
+
+    Returns:
+        (str, dict) | None: 请求指纹和提交记录的完整状态
+    """
+    row = db.query(SubmissionIdempotencyKey, Submission).join(
+        Submission, Submission.id == SubmissionIdempotencyKey.submission_id
+    ).filter(
+        SubmissionIdempotencyKey.username == username,
+        SubmissionIdempotencyKey.key == key
+    ).first()
+    if row is None:
+        return None
+    idempotency_key, submission = row
+    return idempotency_key.fingerprint, submission_state(submission)
+
+
+def remember_idempotency_key(db: Session, username: str, key: str, fingerprint: str, submission_id: int) -> None:
+    """把幂等键指向已有的提交（重复提交直接复用结果时调用），键已存在时不做修改"""
+    db.execute(insert(SubmissionIdempotencyKey).prefix_with("OR IGNORE").values(
+        username=username, key=key, fingerprint=fingerprint, submission_id=submission_id,
+        created_at=datetime.utcnow()
+    ))
+    db.commit()
+
+
+def purge_idempotency_keys(db: Session, retention: timedelta = IDEMPOTENCY_KEY_RETENTION) -> int:
+    """删除超过保留期的幂等键，返回删除条数"""
+    removed = db.query(SubmissionIdempotencyKey).filter(
+        SubmissionIdempotencyKey.created_at < datetime.utcnow() - retention
+    ).delete(synchronize_session=False)
+    db.commit()
+    return removed
+
+
+class SubmissionBatcher:
+    """攒批写入提交记录（只能在事件循环线程中使用）"""
+
+    def __init__(self, max_batch_size: int = SUBMISSION_BATCH_SIZE, max_delay: float = SUBMISSION_BATCH_DELAY,
+                 session_factory=SessionLocal):
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.session_factory = session_factory
+        self._pending: List[Tuple[dict, Optional[Tuple[str, str]], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.batches = 0
+        self.submissions = 0
+        self.largest_batch = 0
+
+    async def submit(self, username: str, title: str, url: str, description: str = "",
+                     idempotency_key: Optional[str] = None, fingerprint: str = "") -> Tuple[dict, bool]:
+        """
+        写入一条提交记录，等待所在批次提交后返回
+
+        Args:
+            idempotency_key: 幂等键，与提交记录在同一事务中写入
+            fingerprint: 请求指纹，幂等键已存在时用于判断是否为同一个提交
+
+        Returns:
+            (dict, bool): 提交记录的完整状态（含 id 和 created_at），是否为幂等键已有的提交
+
+        Raises:
+            IdempotencyKeyConflict: 幂等键已被用于内容不同的提交
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((
+            {"username": username, "title": title, "url": url, "description": description},
+            (idempotency_key, fingerprint) if idempotency_key else None,
+            future
+        ))
+
+        if len(self._pending) >= self.max_batch_size or self.max_delay <= 0:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self.flush)
+
+        # 客户端断开时记录仍会随批次写入，不取消 future
+        return await asyncio.shield(future)
+
+    @staticmethod
+    def _write(db: Session, items: list) -> List[Tuple[dict, bool]]:
+        """在一个事务中写入并提交"""
+        submissions = [Submission(**fields) for fields, _, _ in items]
+        db.add_all(submissions)
+        db.flush()
+        keys = [
+            {"username": submission.username, "key": idempotency[0], "fingerprint": idempotency[1],
+             "submission_id": submission.id}
+            for (_, idempotency, _), submission in zip(items, submissions) if idempotency
+        ]
+        if keys:
+            db.execute(insert(SubmissionIdempotencyKey), keys)
+        states = [submission_state(submission) for submission in submissions]
+        for state in states:
+            record_change(db, "submission", state["id"], "submitted", state)
+        db.commit()
+        return [(state, False) for state in states]
+
+    def _write_each(self, db: Session, items: list) -> list:
+        """逐条写入，幂等键已存在的返回已有的提交；返回每条的结果或异常"""
+        results = []
+        for item in items:
+            try:
+                results.extend(self._write(db, [item]))
+            except IntegrityError as e:
+                db.rollback()
+                fields, idempotency, _ = item
+                existing = find_idempotency_key(db, fields["username"], idempotency[0]) if idempotency else None
+                if existing is None:
+                    results.append(e)
+                elif existing[0] != idempotency[1]:
+                    results.append(IdempotencyKeyConflict("Idempotency-Key has already been used for a different submission"))
+                else:
+                    results.append((existing[1], True))
+        return results
+
+    def flush(self) -> None:
+        """立即写入当前攒下的提交"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        items, self._pending = self._pending, []
+        if not items:
+            return
+
+        db = self.session_factory()
+        try:
+            try:
+                results = self._write(db, items)
+            except IntegrityError:
+                # 某个幂等键已被其他 worker 写入
+                db.rollback()
+                results = self._write_each(db, items)
+        except Exception as e:
+            db.rollback()
+            for _, _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            db.close()
+
+        self.batches += 1
+        self.submissions += len(items)
+        self.largest_batch = max(self.largest_batch, len(items))
+        for (_, _, future), result in zip(items, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "maxBatchSize": self.max_batch_size,
+            "maxDelayMs": self.max_delay * 1000,
+            "batches": self.batches,
+            "submissions": self.submissions,
+            "averageBatch": round(self.submissions / self.batches, 2) if self.batches else 0,
+            "largestBatch": self.largest_batch
+        }
+
+
+# 全局攒批器
+submission_batcher = SubmissionBatcher()
@@ -0,0 +1,165 @@
+"""
+email_check 的测试，使用桩解析器，不需要网络
+
+运行: python -m pytest tests
+"""
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import dns.name
+import dns.resolver
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cache  # noqa: E402
+import email_check  # noqa: E402
+from email_check import DeliverabilityChecker, DomainStatus  # noqa: E402
+
+
+def mx(*hosts):
+    return [SimpleNamespace(exchange=dns.name.from_text(host)) for host in hosts]
+
+
+class StubResolver:
+    """按 (域名, 记录类型) 返回预设结果；值为异常类或异常实例时抛出，没有预设时视为 NoAnswer"""
+
+    def __init__(self, records, gate: asyncio.Event = None):
+        self.records = records
+        self.gate = gate
+        self.calls = []
+
+    async def resolve(self, name, rdtype):
+        self.calls.append((name, rdtype))
+        if self.gate is not None:
+            await self.gate.wait()
+        result = self.records.get((name, rdtype), dns.resolver.NoAnswer)
+        if isinstance(result, BaseException) or (isinstance(result, type) and issubclass(result, BaseException)):
+            raise result
+        return result
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(cache, "time", fake)
+    return fake
+
+
+def check(records, domain="example.org"):
+    async def run():
+        checker = DeliverabilityChecker(resolver=StubResolver(records))
+        return await checker.check_domain(domain)
+    return asyncio.run(run())
+
+
+def test_mx_record_is_deliverable():
+    assert check({("example.org", "MX"): mx("mx1.example.org.", "mx2.example.org.")}) == DomainStatus(True, "mx")
+
+
+def test_null_mx_is_not_deliverable():
+    assert check({("example.org", "MX"): mx(".")}) == DomainStatus(False, "null-mx")
+
+
+def test_nxdomain_is_not_deliverable():
+    assert check({("example.org", "MX"): dns.resolver.NXDOMAIN}) == DomainStatus(False, "nxdomain")
+
+
+@pytest.mark.parametrize("rdtype", ["A", "AAAA"])
+def test_falls_back_to_address_records_without_mx(rdtype):
+    assert check({("example.org", rdtype): [SimpleNamespace()]}) == DomainStatus(True, "a")
+
+
+def test_no_mx_and_no_address_is_not_deliverable():
+    assert check({}) == DomainStatus(False, "no-address")
+
+
+@pytest.mark.parametrize("error", [dns.resolver.LifetimeTimeout, dns.resolver.NoNameservers, OSError("unreachable")])
+def test_dns_errors_fail_open(error):
+    assert check({("example.org", "MX"): error}) == DomainStatus(None, "error")
+
+
+def test_domain_is_normalized():
+    assert check({("example.org", "MX"): mx("mx.example.org.")}, domain=" Example.ORG. ") == DomainStatus(True, "mx")
+
+
+@pytest.mark.parametrize("records, ttl", [
+    ({("example.org", "MX"): mx("mx.example.org.")}, email_check.POSITIVE_TTL),
+    ({("example.org", "MX"): dns.resolver.NXDOMAIN}, email_check.NEGATIVE_TTL),
+    ({("example.org", "MX"): dns.resolver.LifetimeTimeout}, email_check.UNKNOWN_TTL),
+])
+def test_results_are_cached_for_their_ttl(clock, records, ttl):
+    async def run():
+        resolver = StubResolver(records)
+        checker = DeliverabilityChecker(resolver=resolver)
+        first = await checker.check_domain("example.org")
+        calls = len(resolver.calls)
+
+        clock.now += ttl - 1
+        assert await checker.check_domain("example.org") == first
+        assert len(resolver.calls) == calls
+
+        clock.now += 2
+        assert await checker.check_domain("example.org") == first
+        assert len(resolver.calls) == calls * 2
+
+    asyncio.run(run())
+
+
+def test_concurrent_checks_share_one_lookup():
+    async def run():
+        gate = asyncio.Event()
+        resolver = StubResolver({("example.org", "MX"): mx("mx.example.org.")}, gate=gate)
+        checker = DeliverabilityChecker(resolver=resolver)
+
+        tasks = [asyncio.create_task(checker.check_email(f"user{i}@example.org")) for i in range(5)]
+        await asyncio.sleep(0)
+        assert list(checker._pending) == ["example.org"]
+        assert checker.stats()["pending"] == 1
+
+        gate.set()
+        results = await asyncio.gather(*tasks)
+        assert results == [DomainStatus(True, "mx")] * 5
+        assert resolver.calls == [("example.org", "MX")]
+        assert checker._pending == {}
+
+    asyncio.run(run())
+
+
+def test_failed_lookup_is_shared_and_cleared():
+    class BrokenResolver(StubResolver):
+        async def resolve(self, name, rdtype):
+            await super().resolve(name, rdtype)
+            raise RuntimeError("boom")
+
+    async def run():
+        gate = asyncio.Event()
+        checker = DeliverabilityChecker(resolver=BrokenResolver({("example.org", "MX"): mx("mx.example.org.")}, gate=gate))
+        tasks = [asyncio.create_task(checker.check_domain("example.org")) for _ in range(3)]
+        await asyncio.sleep(0)
+        gate.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert checker._pending == {}
+
+    asyncio.run(run())
+
+
+def test_stats_hit_rate():
+    async def run():
+        checker = DeliverabilityChecker(resolver=StubResolver({("example.org", "MX"): mx("mx.example.org.")}))
+        for _ in range(4):
+            await checker.check_email("user@example.org")
+        return checker.stats()
+
+    assert asyncio.run(run()) == {"hits": 3, "misses": 1, "hitRate": 0.75, "pending": 0}
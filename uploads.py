@@ -0,0 +1,153 @@
+"""
+提交文件的分块上传存储
+
+上传过程中数据写入 uploads/partial/{upload_id}.part，同时增量计算 SHA-256；
+上传完成后按哈希存放到 uploads/{sha256[:2]}/{sha256}，内容相同的文件只保存一份。
+"""
+import asyncio
+import hashlib
+import os
+from typing import AsyncIterator, Dict, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+
+# 上传文件存储目录
+UPLOAD_DIR = "./uploads"
+PARTIAL_DIR = os.path.join(UPLOAD_DIR, "partial")
+
+# 单个文件大小上限（字节）
+MAX_UPLOAD_SIZE = 2 * 1024 * 1024 * 1024
+
+# 建议客户端使用的分块大小（字节）
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# 计算哈希时每次读取的字节数
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+class UploadOffsetError(Exception):
+    """分块的偏移量与服务器已接收的字节数不一致"""
+
+    def __init__(self, expected: int):
+        super().__init__(f"Expected offset {expected}")
+        self.expected = expected
+
+
+class UploadTooLargeError(Exception):
+    """写入的数据超过了声明的文件大小"""
+
+
+# 进行中的上传：{upload_id: (已哈希的字节数, sha256对象)}
+_hashers: Dict[str, Tuple[int, "hashlib._Hash"]] = {}
+# 每个上传会话一把锁，防止同一会话的分块并发写入
+_locks: Dict[str, asyncio.Lock] = {}
+
+
+def partial_path(upload_id: str) -> str:
+    return os.path.join(PARTIAL_DIR, f"{upload_id}.part")
+
+
+def stored_path(sha256: str) -> str:
+    return os.path.join(UPLOAD_DIR, sha256[:2], sha256)
+
+
+def get_lock(upload_id: str) -> asyncio.Lock:
+    lock = _locks.get(upload_id)
+    if lock is None:
+        lock = _locks[upload_id] = asyncio.Lock()
+    return lock
+
+
+def release_lock(upload_id: str) -> None:
+    """上传完成并写入数据库后释放会话的锁"""
+    _locks.pop(upload_id, None)
+
+
+def start_upload(upload_id: str) -> None:
+    """创建空的临时文件"""
+    os.makedirs(PARTIAL_DIR, exist_ok=True)
+    open(partial_path(upload_id), "wb").close()
+    _hashers[upload_id] = (0, hashlib.sha256())
+
+
+def _rehash(upload_id: str, offset: int) -> "hashlib._Hash":
+    """服务重启后内存中的哈希状态丢失，从已写入的数据重新计算"""
+    hasher = hashlib.sha256()
+    remaining = offset
+    with open(partial_path(upload_id), "rb") as f:
+        while remaining > 0:
+            block = f.read(min(READ_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            hasher.update(block)
+            remaining -= len(block)
+    return hasher
+
+
+async def write_chunk(upload_id: str, offset: int, received: int, total_size: int,
+                      stream: AsyncIterator[bytes]) -> int:
+    """
+    把一个分块直接追加写入磁盘，并更新增量哈希
+
+    Args:
+        upload_id: 上传会话ID
+        offset: 客户端声明的分块起始偏移
+        received: 数据库中记录的已接收字节数
+        total_size: 文件总大小
+        stream: 请求体数据流
+
+    Returns:
+        int: 写入后新的偏移量
+    """
+    if offset != received:
+        raise UploadOffsetError(received)
+
+    hashed, hasher = _hashers.get(upload_id, (None, None))
+    if hashed != received:
+        hasher = await run_in_threadpool(_rehash, upload_id, received)
+
+    position = received
+    with open(partial_path(upload_id), "r+b") as f:
+        # 截掉上次中断时可能残留的未确认数据
+        f.truncate(received)
+        f.seek(received)
+        try:
+            async for data in stream:
+                if not data:
+                    continue
+                if position + len(data) > total_size:
+                    raise UploadTooLargeError()
+                await run_in_threadpool(f.write, data)
+                hasher.update(data)
+                position += len(data)
+        except ClientDisconnect:
+            # 连接中断：已写入的部分依然有效，返回当前偏移量供客户端续传
+            pass
+        finally:
+            f.flush()
+            _hashers[upload_id] = (position, hasher)
+    return position
+
+
+def finish_upload(upload_id: str, received: int) -> Tuple[str, bool]:
+    """
+    上传完成：计算最终哈希并移动到按哈希命名的位置
+
+    Returns:
+        (sha256, 是否与已有文件重复)
+    """
+    hashed, hasher = _hashers.pop(upload_id, (None, None))
+    if hashed != received:
+        hasher = _rehash(upload_id, received)
+    sha256 = hasher.hexdigest()
+
+    target = stored_path(sha256)
+    if os.path.exists(target):
+        # 内容重复，丢弃临时文件
+        os.remove(partial_path(upload_id))
+        return sha256, True
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(partial_path(upload_id), target)
+    return sha256, False
@@ -0,0 +1,108 @@
+"""
+用户名/邮箱的进程内索引
+
+启动时从数据库加载所有注册的用户名、邮箱及验证状态，注册和验证时同步更新，
+用于注册前的可用性检查以及"用户是否存在且已验证"的判断，避免每次都查询数据库。
+
+多个 uvicorn worker 之间通过一个版本号文件失效：任一进程写入后把文件中的版本号加一，
+其他进程在下次查询时发现版本号变化便重新加载索引（读一个小文件远比查询数据库便宜）。
+
+重新加载可能发生在线程池中（例如批量导入时的检查），因此默认使用独立的读取连接（ReadSessionLocal），
+不使用请求共用的 StaticPool 连接：在其他线程中关闭该连接上的会话会回滚请求已 flush 尚未提交的写入。
+"""
+import threading
+from typing import Dict, List, Tuple
+
+from cache import VersionStamp
+from database import ReadSessionLocal, TeamRegistration
+
+# 跨进程失效用的版本号文件
+INDEX_STAMP_PATH = "./.registration_index.stamp"
+
+
+class RegistrationIndex:
+    """用户名 -> 验证状态、邮箱 -> 用户名 的内存索引"""
+
+    def __init__(self, stamp_path: str = INDEX_STAMP_PATH, session_factory=ReadSessionLocal):
+        self.stamp_path = stamp_path
+        self.session_factory = session_factory
+        self._version = VersionStamp(stamp_path)
+        self._usernames: Dict[str, bool] = {}
+        self._emails: Dict[str, str] = {}
+        self._stamp = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _read_stamp(self) -> int:
+        return self._version.read()
+
+    def _touch(self) -> None:
+        """本进程写入后调用：版本号加一，通知其他进程"""
+        previous, current = self._version.bump()
+        with self._lock:
+            # 加一前的版本号与本进程已加载的一致，说明期间没有其他进程写入，本地索引仍是最新的；
+            # 否则保留旧版本号，下次查询时重新加载
+            if previous == self._stamp:
+                self._stamp = current
+
+    def load(self) -> None:
+        """从数据库重新加载索引"""
+        # 先读版本号再查询，加载期间发生的修改会在下次检查时触发重新加载
+        stamp = self._read_stamp()
+        db = self.session_factory()
+        try:
+            rows = db.query(
+                TeamRegistration.username,
+                TeamRegistration.email,
+                TeamRegistration.is_verified
+            ).all()
+        finally:
+            db.close()
+
+        with self._lock:
+            self._usernames = {username: bool(verified) for username, _, verified in rows}
+            self._emails = {email: username for username, email, _ in rows}
+            self._stamp = stamp
+            self._loaded = True
+
+    def _ensure_fresh(self) -> None:
+        if not self._loaded or self._read_stamp() != self._stamp:
+            self.load()
+
+    def username_taken(self, username: str) -> bool:
+        self._ensure_fresh()
+        return username in self._usernames
+
+    def email_taken(self, email: str) -> bool:
+        self._ensure_fresh()
+        return email in self._emails
+
+    def is_verified(self, username: str) -> bool:
+        """用户是否存在且已完成邮箱验证"""
+        self._ensure_fresh()
+        return self._usernames.get(username, False)
+
+    def add(self, username: str, email: str, verified: bool = False) -> None:
+        """注册后调用"""
+        with self._lock:
+            self._usernames[username] = verified
+            self._emails[email] = username
+        self._touch()
+
+    def add_many(self, items: List[Tuple[str, str]], verified: bool = False) -> None:
+        """批量导入后调用，items 为 (用户名, 邮箱) 列表"""
+        with self._lock:
+            for username, email in items:
+                self._usernames[username] = verified
+                self._emails[email] = username
+        self._touch()
+
+    def mark_verified(self, username: str) -> None:
+        """邮箱验证通过后调用"""
+        with self._lock:
+            self._usernames[username] = True
+        self._touch()
+
+
+# 全局索引实例
+registration_index = RegistrationIndex()